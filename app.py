@@ -3,16 +3,35 @@
 #----------------------------------------------------------------------------#
 
 import json
+import os
+import base64
+import hashlib
+from datetime import date, datetime
+from itertools import groupby
 import dateutil.parser
 import babel
-from flask import Flask, render_template, request, Response, flash, redirect, url_for
+import babel.dates
+from flask import Flask, abort, g, has_request_context, jsonify, make_response, render_template, request, Response, session, stream_with_context, flash, redirect, url_for
 from flask_migrate import Migrate
 from flask_moment import Moment
-from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.dialects.postgresql import ARRAY
+from werkzeug.exceptions import HTTPException
+from werkzeug.http import is_resource_modified
+from routing import RoutingSQLAlchemy, RoutingSession
 import logging
+import click
+import threading
+import time
+from functools import lru_cache, wraps
 from logging import Formatter, FileHandler
 from flask_wtf import Form
 from forms import *
+from search_index import PrefixIndex
+from importer import Importer
+from instrument import SQLInstrumentation
+from metrics import Metrics
+import exporter
+import cache
 #----------------------------------------------------------------------------#
 # App Config.
 #----------------------------------------------------------------------------#
@@ -20,19 +39,34 @@ from forms import *
 app = Flask(__name__)
 moment = Moment(app)
 app.config.from_object('config')
-db = SQLAlchemy(app)
+db = RoutingSQLAlchemy(app)
 migrate = Migrate(app,db)
+sql_instrumentation = SQLInstrumentation(app)
+metrics = Metrics(app)
 # TODO: connect to a local postgresql database
 
+# One database session per request: db.session is opened by the first query
+# and removed, returning its connection to the pool, by Flask-SQLAlchemy's
+# app-context teardown (for streamed responses, after the last chunk).
+# Controllers commit or roll back; they never close the session themselves.
+
 #----------------------------------------------------------------------------#
 # Models.
 #----------------------------------------------------------------------------#
 class Show (db.Model):
         __tablename__ = 'Show'
         id = db.Column(db.Integer,primary_key=True,nullable=False,autoincrement=True)
-        artist_id=db.Column(db.Integer,db.ForeignKey('Artist.id'),primary_key=True,nullable=False)
-        venue_id=db.Column(db.Integer,db.ForeignKey('Venue.id'),primary_key=True,nullable=False)
+        artist_id=db.Column(db.Integer,db.ForeignKey('Artist.id'),nullable=False)
+        venue_id=db.Column(db.Integer,db.ForeignKey('Venue.id'),nullable=False)
         start_time=db.Column(db.Date,nullable=False)
+        updated_at = db.Column(db.DateTime(timezone=True), nullable=False,
+                               server_default=db.text('clock_timestamp()'), server_onupdate=db.FetchedValue())
+        __table_args__ = (
+          db.Index('ix_Show_venue_id_start_time', 'venue_id', 'start_time'),
+          db.Index('ix_Show_artist_id_start_time', 'artist_id', 'start_time'),
+          db.Index('ix_Show_start_time', 'start_time', 'id'),
+          db.Index('ix_Show_updated_at', 'updated_at'),
+        )
 
 
 
@@ -47,13 +81,31 @@ class Venue(db.Model):
     phone = db.Column(db.String(120))
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
-    genres = db.Column(db.ARRAY(db.String))
+    genres = db.Column(ARRAY(db.String))
     website = db.Column(db.String)
     seeking_talent = db.Column(db.String)
     seeking_description = db.Column(db.String)
+    updated_at = db.Column(db.DateTime(timezone=True), nullable=False,
+                           server_default=db.text('clock_timestamp()'), server_onupdate=db.FetchedValue())
     artists = db.relationship("Show", backref="venue", lazy=True)
+    __table_args__ = (
+      db.Index('ix_Venue_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+      db.Index('ix_Venue_city_state', 'city', 'state', 'id'),
+      db.Index('ix_Venue_genres', 'genres', postgresql_using='gin'),
+      db.Index('ix_Venue_updated_at', 'updated_at'),
+    )
     # TODO: implement any missing fields, as a database migration using Flask-Migrate
 
+# Sort key of the venue directory. city and state are nullable, and a NULL
+# in the keyset's row comparison makes the whole comparison NULL, which would
+# drop those venues from every page after the first; they sort as '' instead.
+VENUE_DIRECTORY_ORDER = [
+  db.func.coalesce(Venue.city, '').label('city_key'),
+  db.func.coalesce(Venue.state, '').label('state_key'),
+  Venue.id,
+]
+db.Index('ix_Venue_directory', db.func.coalesce(Venue.city, ''), db.func.coalesce(Venue.state, ''), Venue.id)
+
 class Artist(db.Model):
     __tablename__ = 'Artist'
 
@@ -62,31 +114,723 @@ class Artist(db.Model):
     city = db.Column(db.String(120))
     state = db.Column(db.String(120))
     phone = db.Column(db.String(120))
-    genres = db.Column(db.ARRAY(db.String))
+    genres = db.Column(ARRAY(db.String))
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
     website = db.Column(db.String)
     seeking_venue = db.Column(db.String)
     seeking_description = db.Column(db.String)
+    updated_at = db.Column(db.DateTime(timezone=True), nullable=False,
+                           server_default=db.text('clock_timestamp()'), server_onupdate=db.FetchedValue())
     venue = db.relationship("Show", backref="artist", lazy=True)
+    __table_args__ = (
+      db.Index('ix_Artist_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+      db.Index('ix_Artist_genres', 'genres', postgresql_using='gin'),
+      db.Index('ix_Artist_updated_at', 'updated_at'),
+    )
     # TODO: implement any missing fields, as a database migration using Flask-Migrate
 
+class ImportCheckpoint(db.Model):
+    # progress of `flask import` per (kind, file), committed with each batch
+    __tablename__ = 'ImportCheckpoint'
+
+    source = db.Column(db.String, primary_key=True)
+    records = db.Column(db.Integer, nullable=False)
+
+# updated_at is set by the database: on insert by its default, on update by
+# a trigger (migration d5f1a7c93b28), with clock_timestamp() so rows written
+# late in a long transaction are not stamped with its start. A deleted row
+# leaves no updated_at behind, so deletes are noted per table in LastDeletion.
+
+class LastDeletion(db.Model):
+    __tablename__ = 'LastDeletion'
+
+    table_name = db.Column(db.String, primary_key=True)
+    deleted_at = db.Column(db.DateTime(timezone=True), nullable=False)
+
+# Summary tables behind /stats. They are written only by the database
+# triggers created in migration b7c41e2f5a90, in the same transaction as the
+# Show, Venue or Artist change, and are read-only here.
+
+class StatsVenue(db.Model):
+    __tablename__ = 'StatsVenue'
+
+    venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id', ondelete='CASCADE'), primary_key=True)
+    num_shows = db.Column(db.Integer, nullable=False)
+    __table_args__ = (
+      db.Index('ix_StatsVenue_num_shows', 'num_shows', 'venue_id'),
+    )
+
+class StatsArtist(db.Model):
+    __tablename__ = 'StatsArtist'
+
+    artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id', ondelete='CASCADE'), primary_key=True)
+    num_shows = db.Column(db.Integer, nullable=False)
+    __table_args__ = (
+      db.Index('ix_StatsArtist_num_shows', 'num_shows', 'artist_id'),
+    )
+
+class StatsCityDay(db.Model):
+    # shows per (city, state, day); a null city or state is stored as ''
+    __tablename__ = 'StatsCityDay'
+
+    city = db.Column(db.String(120), primary_key=True)
+    state = db.Column(db.String(120), primary_key=True)
+    day = db.Column(db.Date, primary_key=True, index=True)
+    num_shows = db.Column(db.Integer, nullable=False)
+
+class StatsGenre(db.Model):
+    # venues and artists listing the genre, and shows by artists listing it
+    __tablename__ = 'StatsGenre'
+
+    genre = db.Column(db.String, primary_key=True)
+    num_venues = db.Column(db.Integer, nullable=False)
+    num_artists = db.Column(db.Integer, nullable=False)
+    num_shows = db.Column(db.Integer, nullable=False)
+
 # TODO Implement Show and Artist models, and complete all model relationships and properties, as a database migration.
 
+# Create the backrefs (Show.venue, Show.artist) now: the query builders use
+# them directly, which would fail in a process whose first query is theirs.
+db.configure_mappers()
+
 #----------------------------------------------------------------------------#
 # Filters.
 #----------------------------------------------------------------------------#
 
-def format_datetime(value, format='medium'):
-  date = dateutil.parser.parse(value)
-  if format == 'full':
-      format="EEEE MMMM, d, y 'at' h:mma"
-  elif format == 'medium':
-      format="EE MM, dd, y h:mma"
-  return babel.dates.format_datetime(date, format)
+DATETIME_FORMATS = {
+  'full': "EEEE MMMM, d, y 'at' h:mma",
+  'medium': "EE MM, dd, y h:mma",
+}
+
+@lru_cache(maxsize=64)
+def datetime_pattern(format, locale):
+  # compiled babel pattern and locale, once per (format, locale)
+  return babel.dates.parse_pattern(format), babel.Locale.parse(locale)
+
+@lru_cache(maxsize=4096)
+def format_datetime_cached(value, format, locale):
+  pattern, locale = datetime_pattern(format, locale)
+  return pattern.apply(value, locale)
+
+def format_datetime(value, format='medium', locale=None):
+  # Takes date/datetime objects as they are; only strings go through the
+  # parser. Show listings repeat the same few dates, so formatted output is
+  # memoized per (value, format, locale).
+  if isinstance(value, str):
+    value = dateutil.parser.parse(value)
+  elif not isinstance(value, datetime):
+    value = datetime(value.year, value.month, value.day)
+  if value.tzinfo is None:
+    # what babel.dates.format_datetime assumes for naive values
+    value = value.replace(tzinfo=babel.dates.UTC)
+  return format_datetime_cached(value, DATETIME_FORMATS.get(format, format), locale or babel.dates.LC_TIME)
 
 app.jinja_env.filters['datetime'] = format_datetime
 
+#----------------------------------------------------------------------------#
+# Queries.
+#----------------------------------------------------------------------------#
+
+def show_listing_query():
+  # The whole show listing in one statement: venue and artist columns come
+  # from joins over the Show.venue / Show.artist backrefs instead of a
+  # Venue.query.get / Artist.query.get round-trip per row.
+  return db.session.query(
+      Show.venue_id,
+      Venue.name.label('venue_name'),
+      Show.artist_id,
+      Artist.name.label('artist_name'),
+      Artist.image_link.label('artist_image_link'),
+      Show.start_time,
+      Show.id
+    ).join(Show.venue).join(Show.artist).order_by(Show.start_time, Show.id)
+
+def venue_directory_query(current_time):
+  # Venues with their upcoming-show counts, computed by a GROUP BY inside
+  # Postgres. Rows come back ordered by VENUE_DIRECTORY_ORDER, (city, state)
+  # first, so the controller can fold them into areas in a single pass
+  # without loading any Show rows.
+  upcoming = db.session.query(
+      Show.venue_id,
+      db.func.count(Show.id).label('num_upcoming_shows')
+    ).filter(Show.start_time > current_time).group_by(Show.venue_id).subquery()
+  return db.session.query(
+      Venue.id,
+      Venue.name,
+      Venue.city,
+      Venue.state,
+      *VENUE_DIRECTORY_ORDER[:2],
+      db.func.coalesce(upcoming.c.num_upcoming_shows, 0).label('num_upcoming_shows')
+    ).outerjoin(upcoming, upcoming.c.venue_id == Venue.id
+    ).order_by(*VENUE_DIRECTORY_ORDER)
+
+def genre_filter(query, model, genres, match='any'):
+  # Rows listing any (`genres && ...`) or all (`genres @> ...`) of `genres`;
+  # both operators are served by the GIN index on the genres array.
+  if not genres:
+    return query
+  if match == 'all':
+    return query.filter(model.genres.contains(genres))
+  return query.filter(model.genres.overlap(genres))
+
+def requested_genres():
+  # ?genre=Jazz&genre=Blues[&match=all], from the query string or a form
+  match = request.values.get('match', 'any')
+  if match not in ('any', 'all'):
+    abort(400)
+  return [genre for genre in request.values.getlist('genre') if genre], match
+
+def search_query(model, search_term, limit=None, genres=None, match='any'):
+  # Case-insensitive partial match on name. The ILIKE is served by the
+  # pg_trgm GIN index on name; results are ranked by trigram similarity and
+  # capped at SEARCH_LIMIT. `total` carries the number of matches before the
+  # limit so the page can still report it.
+  pattern = '%' + search_term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+  query = db.session.query(
+      model.id,
+      model.name,
+      db.func.count().over().label('total')
+    ).filter(model.name.ilike(pattern, escape='\\'))
+  return genre_filter(query, model, genres, match
+    ).order_by(db.func.similarity(model.name, search_term).desc(), model.id
+    ).limit(limit or app.config['SEARCH_LIMIT'])
+
+def search_response(model, search_term, genres=None, match='any'):
+  rows = search_query(model, search_term, genres=genres, match=match).all()
+  return {
+    "count": rows[0].total if rows else 0,
+    "data": [{"id": row.id, "name": row.name} for row in rows]
+  }
+
+def show_listing_row(show):
+  return {
+    "venue_id": show.venue_id,
+    "venue_name": show.venue_name,
+    "artist_id": show.artist_id,
+    "artist_name": show.artist_name,
+    "artist_image_link": show.artist_image_link,
+    "start_time": show.start_time.strftime('%m/%d/%Y')
+  }
+
+def show_export_query():
+  # The show calendar with venue and artist names, in exporter.SHOW_COLUMNS
+  # order, keyed on (start_time, id) like the /shows listing.
+  return db.session.query(
+      Show.id.label('show_id'),
+      Show.start_time,
+      Show.venue_id,
+      Venue.name.label('venue_name'),
+      Venue.city.label('venue_city'),
+      Venue.state.label('venue_state'),
+      Show.artist_id,
+      Artist.name.label('artist_name')
+    ).join(Show.venue).join(Show.artist).order_by(Show.start_time, Show.id)
+
+def export_chunks(query, order_by, cursor, chunk_rows=None):
+  # Yields `query` as lists of at most chunk_rows row tuples. Each chunk is
+  # its own keyset range query on `order_by` (continuing after the row
+  # fields named by `cursor`), read through a server-side cursor and
+  # followed by a rollback, so no transaction stays open across the export.
+  chunk_rows = chunk_rows or app.config['EXPORT_CHUNK_ROWS']
+  key = db.tuple_(*order_by)
+  after = None
+  while True:
+    chunk_query = query if after is None else query.filter(key > after)
+    rows = chunk_query.limit(chunk_rows).yield_per(chunk_rows).all()
+    db.session.rollback()
+    if not rows:
+      return
+    yield [tuple(row) for row in rows]
+    if len(rows) < chunk_rows:
+      return
+    after = tuple(getattr(rows[-1], field) for field in cursor)
+
+def stats_summary(today, limit=None):
+  # Dashboard figures, read from the trigger-maintained Stats* tables: top
+  # venues and artists walk the (num_shows, id) indexes backwards and the
+  # city figures sum per-day rows after `today`, so none of this grows with
+  # the number of shows.
+  limit = limit or app.config['STATS_LIMIT']
+  venues = db.session.query(Venue.id, Venue.name, Venue.city, Venue.state, StatsVenue.num_shows
+    ).join(Venue, Venue.id == StatsVenue.venue_id
+    ).order_by(StatsVenue.num_shows.desc(), StatsVenue.venue_id.desc()).limit(limit)
+  artists = db.session.query(Artist.id, Artist.name, StatsArtist.num_shows
+    ).join(Artist, Artist.id == StatsArtist.artist_id
+    ).order_by(StatsArtist.num_shows.desc(), StatsArtist.artist_id.desc()).limit(limit)
+  genres = StatsGenre.query.order_by(StatsGenre.num_shows.desc(), StatsGenre.genre).limit(limit)
+  num_upcoming = db.func.sum(StatsCityDay.num_shows)
+  cities = db.session.query(StatsCityDay.city, StatsCityDay.state, num_upcoming.label('num_upcoming_shows')
+    ).filter(StatsCityDay.day > today
+    ).group_by(StatsCityDay.city, StatsCityDay.state
+    ).having(num_upcoming > 0
+    ).order_by(num_upcoming.desc(), StatsCityDay.city, StatsCityDay.state).limit(limit)
+  return {
+    "venues": [{
+      "id": row.id,
+      "name": row.name,
+      "city": row.city,
+      "state": row.state,
+      "num_shows": row.num_shows
+    } for row in venues],
+    "artists": [{
+      "id": row.id,
+      "name": row.name,
+      "num_shows": row.num_shows
+    } for row in artists],
+    "genres": [{
+      "genre": row.genre,
+      "num_venues": row.num_venues,
+      "num_artists": row.num_artists,
+      "num_shows": row.num_shows
+    } for row in genres],
+    "upcoming_by_city": [{
+      "city": row.city,
+      "state": row.state,
+      "num_upcoming_shows": row.num_upcoming_shows
+    } for row in cities]
+  }
+
+def available_venues_query(city, state, start, end):
+  # Venues in (city, state) with no show from `start` through `end`, as one
+  # anti-join: the city filter and id order come from ix_Venue_city_state,
+  # and each candidate is probed in ix_Show_venue_id_start_time, so only the
+  # shows inside the date range at this city's venues are ever read.
+  booked = db.session.query(Show.id).filter(
+      Show.venue_id == Venue.id,
+      Show.start_time.between(start, end)
+    ).exists()
+  return db.session.query(
+      Venue.id,
+      Venue.name,
+      Venue.address,
+      Venue.genres
+    ).filter(Venue.city == city, Venue.state == state, ~booked
+    ).order_by(Venue.id)
+
+def requested_availability():
+  # ?city=&state=&from=YYYY-MM-DD[&to=YYYY-MM-DD]; `to` defaults to `from`
+  city, state = request.args.get('city', ''), request.args.get('state', '')
+  try:
+    start = date.fromisoformat(request.args.get('from', ''))
+    end = date.fromisoformat(request.args.get('to') or start.isoformat())
+  except ValueError:
+    abort(400)
+  if not city or not state or end < start:
+    abort(400)
+  return city, state, start, end
+
+def artist_listing_query():
+  return db.session.query(Artist.id, Artist.name).order_by(Artist.id)
+
+SHOW_HISTORY_JOINS = {
+  # owner model: (owner key on Show, counterpart model, payload prefix); the
+  # prefix is also the name of the Show backref leading to the counterpart.
+  'Venue': ('venue_id', Artist, 'artist'),
+  'Artist': ('artist_id', Venue, 'venue'),
+}
+
+def load_show_history(owner, owner_id, today):
+  # Full show history of a venue or artist with the counterpart's columns
+  # fetched by the same joined query, partitioned into (past, upcoming) in a
+  # single pass. Shows on `today` count as past, as before. Also returns the
+  # date of the first upcoming show, the day the split next changes.
+  owner_key, counterpart, prefix = SHOW_HISTORY_JOINS[owner.__name__]
+  rows = db.session.query(
+      counterpart.id,
+      counterpart.name,
+      counterpart.image_link,
+      Show.start_time
+    ).select_from(Show).join(getattr(Show, prefix)).filter(getattr(Show, owner_key) == owner_id
+    ).order_by(Show.start_time, Show.id)
+  past_shows = []
+  upcoming_shows = []
+  next_change = None
+  for row in rows:
+    if row.start_time > today and next_change is None:
+      next_change = row.start_time
+    shows = past_shows if row.start_time <= today else upcoming_shows
+    shows.append({
+      prefix + "_id": row.id,
+      prefix + "_name": row.name,
+      prefix + "_image_link": row.image_link,
+      "start_time": row.start_time.strftime('%m/%d/%Y')
+    })
+  return past_shows, upcoming_shows, next_change
+
+def venue_detail(venue_id, today=None):
+  # Venue page payload and the date its past/upcoming split next changes,
+  # shared by the HTML page and the API.
+  today = today or datetime.now().date()
+  venue = Venue.query.get(venue_id)
+  if venue is None:
+    abort(404)
+  past_shows, upcoming_shows, next_change = load_show_history(Venue, venue_id, today)
+  data = {
+    "id": venue.id,
+    "name": venue.name,
+    "genres": venue.genres,
+    "address": venue.address,
+    "city": venue.city,
+    "state": venue.state,
+    "phone": venue.phone,
+    "website": venue.website,
+    "facebook_link": venue.facebook_link,
+    "seeking_talent": venue.seeking_talent,
+    "seeking_description": venue.seeking_description,
+    "image_link":venue.image_link,
+    "past_shows":past_shows,
+    "upcoming_shows":upcoming_shows,
+    "past_shows_count": len(past_shows),
+    "upcoming_shows_count": len(upcoming_shows)
+  }
+  return data, next_change
+
+def artist_detail(artist_id, today=None):
+  today = today or datetime.now().date()
+  artist = Artist.query.get(artist_id)
+  if artist is None:
+    abort(404)
+  past_shows, upcoming_shows, next_change = load_show_history(Artist, artist_id, today)
+  data = {
+    "id": artist.id,
+    "name": artist.name,
+    "genres": artist.genres,
+    "city": artist.city,
+    "state": artist.state,
+    "phone": artist.phone,
+    "website": artist.website,
+    "facebook_link": artist.facebook_link,
+    "seeking_venue": artist.seeking_venue,
+    "seeking_description": artist.seeking_description,
+    "image_link": artist.image_link,
+    "past_shows": past_shows,
+    "upcoming_shows": upcoming_shows,
+    "past_shows_count": len(past_shows),
+    "upcoming_shows_count": len(upcoming_shows)
+  }
+  return data, next_change
+
+def next_upcoming_date(current_time):
+  # start date of the earliest upcoming show: the next time any upcoming
+  # count changes without a write
+  return db.session.query(db.func.min(Show.start_time)).filter(Show.start_time > current_time).scalar()
+
+#----------------------------------------------------------------------------#
+# Pagination.
+#----------------------------------------------------------------------------#
+
+# Listings are paged by keyset: a cursor holds the sort key of the first or
+# last row on the current page and the next page is a `(key) > (cursor)`
+# range scan, so deep pages cost the same as the first one (no OFFSET).
+
+def encode_cursor(row, order_by):
+  values = [getattr(row, column.key) for column in order_by]
+  payload = json.dumps(values, default=lambda value: value.isoformat())
+  return base64.urlsafe_b64encode(payload.encode()).decode()
+
+def cursor_value(column, value):
+  # a cursor comes from the query string: a value Postgres cannot compare
+  # with its column would fail the page with a 500
+  python_type = column.type.python_type
+  if python_type is date:
+    return date.fromisoformat(value)
+  if type(value) is not python_type:
+    raise ValueError(value)
+  if python_type is int and not -2**31 <= value < 2**31:
+    raise ValueError(value)
+  if python_type is str and '\x00' in value:
+    raise ValueError(value)
+  return value
+
+def decode_cursor(cursor, order_by):
+  try:
+    values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    if not isinstance(values, list) or len(values) != len(order_by):
+      raise ValueError(cursor)
+    return tuple(cursor_value(column, value) for column, value in zip(order_by, values))
+  except (TypeError, ValueError):
+    abort(400)
+
+def keyset_query(query, order_by, after=None, before=None, per_page=None):
+  # One page of `query` plus a look-ahead row. Pages before a cursor come
+  # back in descending order.
+  per_page = per_page or app.config['PAGE_SIZE']
+  key = db.tuple_(*order_by)
+  query = query.order_by(None)
+  if before:
+    return query.filter(key < decode_cursor(before, order_by)
+      ).order_by(*[column.desc() for column in order_by]).limit(per_page + 1)
+  if after:
+    query = query.filter(key > decode_cursor(after, order_by))
+  return query.order_by(*order_by).limit(per_page + 1)
+
+def paginate(query, order_by, after=None, before=None, per_page=None):
+  # Returns (rows, next_cursor, prev_cursor). `order_by` columns must be
+  # selected by `query` and together identify a row uniquely.
+  per_page = per_page or app.config['PAGE_SIZE']
+  rows = keyset_query(query, order_by, after, before, per_page).all()
+  if before:
+    has_prev, has_next = len(rows) > per_page, True
+    rows = rows[:per_page][::-1]
+  else:
+    has_prev, has_next = bool(after), len(rows) > per_page
+    rows = rows[:per_page]
+  next_cursor = encode_cursor(rows[-1], order_by) if rows and has_next else None
+  prev_cursor = encode_cursor(rows[0], order_by) if rows and has_prev else None
+  return rows, next_cursor, prev_cursor
+
+@app.template_global()
+def page_url(**cursor):
+  # url for the current listing with the given cursor, keeping other args
+  args = request.args.to_dict(flat=False)
+  args.pop('after', None)
+  args.pop('before', None)
+  args.update(cursor)
+  return url_for(request.endpoint, **args)
+
+#----------------------------------------------------------------------------#
+# Autocomplete.
+#----------------------------------------------------------------------------#
+
+# Optional in-process prefix index over venue and artist names, serving the
+# autocomplete endpoints without touching Postgres. It is filled from the
+# database on first use and kept current by the create/edit/delete routes.
+# Without it (AUTOCOMPLETE_INDEX off) the endpoints run the name search.
+autocomplete_index = PrefixIndex() if app.config['AUTOCOMPLETE_INDEX'] else None
+autocomplete_built = threading.Event()
+autocomplete_build_lock = threading.Lock()
+# edits made while a build reads the tables, replayed onto the new index
+autocomplete_edits = None
+autocomplete_edits_lock = threading.Lock()
+
+def build_autocomplete_index():
+  # fill a new index and swap it in, so that an edit committed during the
+  # build is not overwritten by the row read before it
+  global autocomplete_index, autocomplete_edits
+  if autocomplete_index is None or autocomplete_built.is_set():
+    return
+  with autocomplete_build_lock:
+    if autocomplete_built.is_set():
+      return
+    with autocomplete_edits_lock:
+      autocomplete_edits = []
+    index = PrefixIndex()
+    try:
+      for kind, model in (('venue', Venue), ('artist', Artist)):
+        for row in db.session.query(model.id, model.name).yield_per(1000):
+          index.add(kind, row.id, row.name)
+    except BaseException:
+      with autocomplete_edits_lock:
+        autocomplete_edits = None
+      raise
+    with autocomplete_edits_lock:
+      for edit in autocomplete_edits:
+        apply_autocomplete_edit(index, *edit)
+      autocomplete_index, autocomplete_edits = index, None
+    autocomplete_built.set()
+
+def update_autocomplete_index(kind, id, name=None):
+  # name=None removes the entry
+  if autocomplete_index is None:
+    return
+  with autocomplete_edits_lock:
+    if autocomplete_edits is not None:
+      autocomplete_edits.append((kind, id, name))
+    else:
+      apply_autocomplete_edit(autocomplete_index, kind, id, name)
+
+def apply_autocomplete_edit(index, kind, id, name):
+  if name is None:
+    index.remove(kind, id)
+  else:
+    index.add(kind, id, name)
+
+def autocomplete_response(kind):
+  query, limit = request.args.get('q', ''), app.config['AUTOCOMPLETE_LIMIT']
+  if autocomplete_index is None:
+    model = Venue if kind == 'venue' else Artist
+    matches = [(row.id, row.name) for row in search_query(model, query.strip(), limit)] if query.strip() else []
+  else:
+    build_autocomplete_index()
+    matches = autocomplete_index.search(kind, query, limit)
+  return jsonify({"data": [{"id": id, "name": name} for id, name in matches]})
+
+#----------------------------------------------------------------------------#
+# Read replicas.
+#----------------------------------------------------------------------------#
+
+# Views decorated with @replica_reads query a replica (see routing.py)
+# unless this browser wrote something in the last DB_REPLICA_STICKY_SECONDS:
+# every commit that flushed changes marks the browser's session, so the
+# redirect after a create or edit reads its own write from the primary.
+
+def reads_from_primary():
+  return session.get('primary_until', 0) > time.time()
+
+def replica_reads(view):
+  @wraps(view)
+  def wrapper(*args, **kwargs):
+    if not reads_from_primary():
+      db.use_replica()
+    return view(*args, **kwargs)
+  # read-only: also what asgi.py serves on its event loop
+  wrapper.read_only = True
+  return wrapper
+
+@db.event.listens_for(RoutingSession, 'after_flush')
+def note_write(db_session, flush_context):
+  db_session.info['wrote'] = True
+
+@db.event.listens_for(RoutingSession, 'after_commit')
+def stick_to_primary(db_session):
+  if db_session.info.pop('wrote', False) and has_request_context() and db.replicas():
+    session['primary_until'] = time.time() + app.config['DB_REPLICA_STICKY_SECONDS']
+
+@db.event.listens_for(RoutingSession, 'after_rollback')
+def forget_write(db_session):
+  db_session.info.pop('wrote', None)
+
+#----------------------------------------------------------------------------#
+# Page cache.
+#----------------------------------------------------------------------------#
+
+# Views decorated with @cached_page are stored by path under the tags they
+# declare with cache_tags(). Tags name what a page displays:
+#   'venues' / 'artists' / 'shows'    membership and order of a listing
+#   'venue:<id>' / 'artist:<id>'      that row's own columns
+#   'venue-shows:<id>' / 'artist-shows:<id>'  that row's set of shows
+# and each write invalidates exactly the tags it changes.
+page_cache = cache.from_config(app.config)
+
+def cache_tags(*tags):
+  g.setdefault('cache_tags', set()).update(tags)
+
+def cache_until(day):
+  # Expire the page at the start of `day`: pages splitting shows into past
+  # and upcoming stay valid until a show's start_time is reached.
+  if day is not None:
+    expires = datetime.combine(day, datetime.min.time()).timestamp()
+    g.cache_expires = min(g.get('cache_expires') or expires, expires)
+
+def invalidate_pages(*tags):
+  if page_cache is not None:
+    page_cache.invalidate(*tags)
+
+def cached_page(view):
+  @wraps(view)
+  def wrapper(*args, **kwargs):
+    # pages carrying flashed messages, or read back by a browser that has
+    # just written, are rendered fresh and not stored
+    if page_cache is None or session.get('_flashes') or reads_from_primary():
+      return view(*args, **kwargs)
+    key = request.full_path
+    body = page_cache.get(key)
+    metrics.page_cache_lookup(body is not None)
+    if body is not None:
+      return Response(body, mimetype='text/html')
+    generation = page_cache.generation()
+    g.cache_tags = set()
+    g.cache_expires = None
+    response = make_response(view(*args, **kwargs))
+    if g.get('db_replica'):
+      # the replica may not have replayed the write behind this miss yet
+      expires = time.time() + app.config['DB_REPLICA_MAX_LAG']
+      g.cache_expires = min(g.cache_expires or expires, expires)
+    if response.status_code == 200 and g.get('cache_tags'):
+      page_cache.set(key, response.get_data(), g.cache_tags, generation, g.cache_expires)
+    return response
+  return wrapper
+
+@app.route('/cache/stats')
+def cache_stats():
+  if page_cache is None:
+    abort(404)
+  return jsonify(page_cache.stats())
+
+@app.route('/pool/stats')
+def pool_stats():
+  # checkout waits and current occupancy of this worker's connection pools
+  stats = db.engine.pool.stats()
+  if db.replicas():
+    stats["replicas"] = {bind: db.get_engine(app, bind).pool.stats() for bind in db.replicas()}
+  return jsonify(stats)
+
+#----------------------------------------------------------------------------#
+# Conditional requests.
+#----------------------------------------------------------------------------#
+
+# Views decorated with @conditional_page(last_change) carry an ETag and a
+# Last-Modified header derived from last_change(**view_args): the time of
+# the latest write to the rows the page shows, read from updated_at and
+# LastDeletion through indexes, without loading the rows. A request whose
+# If-None-Match or If-Modified-Since still matches is answered 304 before
+# the page cache is consulted or anything is rendered.
+
+def page_version():
+  # digest of the code and templates that render pages: a deploy changing
+  # either gives every page a new ETag
+  digest = hashlib.sha1()
+  with open(__file__, 'rb') as f:
+    digest.update(f.read())
+  for name in sorted(app.jinja_env.list_templates(extensions=['html'])):
+    digest.update(app.jinja_loader.get_source(app.jinja_env, name)[0].encode())
+  return digest.hexdigest()
+
+PAGE_VERSION = page_version()
+
+def deleted_at(*models):
+  return db.session.query(db.func.max(LastDeletion.deleted_at)).filter(
+    LastDeletion.table_name.in_([model.__tablename__ for model in models])).scalar_subquery()
+
+def last_change(*models):
+  # latest write to any row of `models`; for the listings, which page
+  # through (and count shows over) whole tables
+  return db.session.query(db.func.greatest(
+    deleted_at(*models),
+    *[db.session.query(db.func.max(model.updated_at)).scalar_subquery() for model in models]
+  )).scalar()
+
+def show_history_last_change(owner, owner_id):
+  # latest write to a venue or artist, its shows or the counterparts they
+  # name; None if there is no such venue or artist
+  owner_key, counterpart, prefix = SHOW_HISTORY_JOINS[owner.__name__]
+  return db.session.query(db.func.greatest(
+    owner.updated_at, db.func.max(Show.updated_at), db.func.max(counterpart.updated_at), deleted_at(Show)
+  )).select_from(owner).outerjoin(Show, getattr(Show, owner_key) == owner.id
+  ).outerjoin(getattr(Show, prefix)).filter(owner.id == owner_id).group_by(owner.id).scalar()
+
+def conditional_page(last_change):
+  def decorator(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+      # pages carrying flashed messages differ from the stored copy
+      if session.get('_flashes'):
+        return view(*args, **kwargs)
+      # compare against the database the page will be read from
+      if not reads_from_primary():
+        db.use_replica()
+      changed = last_change(*args, **kwargs)
+      if changed is None:
+        return view(*args, **kwargs)
+      # pages splitting shows into past and upcoming change at midnight
+      midnight = datetime.combine(datetime.now().date(), datetime.min.time()).astimezone()
+      changed = max(changed, midnight)
+      etag = hashlib.sha1(('%s %s' % (PAGE_VERSION, changed.isoformat())).encode()).hexdigest()[:20]
+      if is_resource_modified(request.environ, etag=etag, last_modified=changed):
+        response = make_response(view(*args, **kwargs))
+        if response.status_code != 200:
+          return response
+      else:
+        response = Response(status=304)
+      response.set_etag(etag)
+      response.last_modified = changed
+      # revalidate every time rather than guess a lifetime from Last-Modified
+      response.cache_control.no_cache = True
+      return response
+    return wrapper
+  return decorator
+
 #----------------------------------------------------------------------------#
 # Controllers.
 #----------------------------------------------------------------------------#
@@ -100,98 +844,82 @@ def index():
 #  ----------------------------------------------------------------
 
 @app.route('/venues')
+@conditional_page(lambda: last_change(Venue, Show))
+@cached_page
+@replica_reads
 def venues():
   # TODO: replace with real venues data.
   #       num_shows should be aggregated based on number of upcoming shows per venue.
-  current_time = datetime.now().strftime('%m/%d/%Y')
-  upcoming_shows=Show.query.filter(Show.start_time>current_time).all()
-  venue_data=Venue.query.all()
+  current_time = datetime.now().date()
+  genres, match = requested_genres()
+  rows, next_cursor, prev_cursor = paginate(
+    genre_filter(venue_directory_query(current_time), Venue, genres, match), VENUE_DIRECTORY_ORDER,
+    after=request.args.get('after'), before=request.args.get('before'))
   data =[]
-  for venue in venue_data:
+  # on the sort keys: a NULL city or state sorts, and so groups, with ''
+  for (city, state), venue_rows in groupby(rows, key=lambda v: (v.city_key, v.state_key)):
     data.append({
-      "city": venue.city,
-      "state": venue.state,
+      "city": city,
+      "state": state,
       "venues": [{
         "id": venue.id,
         "name": venue.name,
-        "num_upcoming_shows": len(upcoming_shows),
-      }]
+        "num_upcoming_shows": venue.num_upcoming_shows,
+      } for venue in venue_rows]
     })
-  return render_template('pages/venues.html', areas=data);
+  cache_tags('venues', *['venue:%d' % venue.id for venue in rows] + ['venue-shows:%d' % venue.id for venue in rows])
+  cache_until(next_upcoming_date(current_time))
+  return render_template('pages/venues.html', areas=data, genres=genres, match=match,
+                         next_cursor=next_cursor, prev_cursor=prev_cursor)
 
 @app.route('/venues/search', methods=['POST'])
+@replica_reads
 def search_venues():
-
-  search_term = request.form.get("search_term")
-  responses_search = Venue.query.filter(Venue.name.ilike('%' + search_term + '%')).all()
-  data =[]
-
-  count = 0
-  # TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
-  # seach for Hop should return "The Musical Hop".
-  # search for "Music" should return "The Musical Hop" and "Park Square Live Music & Coffee"
-  for response_search in responses_search:
-    count+=1
-    data.append({
-     "id":response_search.id,
-     "name":response_search.name,
-
-    })
-
-  response = {
-    "count": count,
-    "data": data
-  }
-  return render_template('pages/search_venues.html', results=response, search_term=request.form.get('search_term', ''))
-
-@app.route('/venues/<int:venue_id>')
-def show_venue(venue_id):
-  # shows the venue page with the given venue_id
-  # TODO: replace with real venue data from the venues table, using venue_id
-  current_time = datetime.now().strftime('%m/%d/%Y')
-  venue = Venue.query.get(venue_id)
-  dataList=[]
-  past_shows=[]
-  upcoming_shows=[]
-  past_shows_query= Show.query.filter_by(venue_id=venue_id).filter(Show.start_time<=current_time).all()
-  upcoming_shows_query= Show.query.filter_by(venue_id=venue_id).filter(Show.start_time>current_time).all()
-
-  for show in past_shows_query:
-    artist = Artist.query.get(show.venue_id)
-    past_shows.append({
-     "artist_id":artist.id,
-     "artist_name": artist.name,
-     "artist_image_link": artist.image_link,
-     "start_time": show.start_time.strftime('%m/%d/%Y')
-    })
-  for show in upcoming_shows_query:
-    artist = Artist.query.get(show.venue_id)
-    upcoming_shows.append({
-     "artist_id":artist.id,
-     "artist_name": artist.name,
-     "artist_image_link": artist.image_link,
-     "start_time": show.start_time.strftime('%m/%d/%Y')
-    })
-  dataList.append({
+  genres, match = requested_genres()
+  response = search_response(Venue, request.form.get('search_term', ''), genres, match)
+  return render_template('pages/search_venues.html', results=response, search_term=request.form.get('search_term', ''),
+                         genres=genres, match=match)
+
+@app.route('/venues/autocomplete')
+@replica_reads
+def autocomplete_venues():
+  return autocomplete_response('venue')
+
+@app.route('/venues/available')
+@conditional_page(lambda: last_change(Venue, Show))
+@cached_page
+@replica_reads
+def available_venues():
+  # the venue form's city and state fields, filled from the query string
+  form = VenueForm(request.args)
+  if 'from' not in request.args:
+    return render_template('pages/available_venues.html', form=form, venues=None)
+  city, state, start, end = requested_availability()
+  genres, match = requested_genres()
+  rows, next_cursor, prev_cursor = paginate(
+    genre_filter(available_venues_query(city, state, start, end), Venue, genres, match), [Venue.id],
+    after=request.args.get('after'), before=request.args.get('before'))
+  data = [{
     "id": venue.id,
     "name": venue.name,
-    "genres": venue.genres,
     "address": venue.address,
-    "city": venue.city,
-    "state": venue.state,
-    "phone": venue.phone,
-    "website": venue.website,
-    "facebook_link": venue.facebook_link,
-    "seeking_talent": venue.seeking_talent,
-    "seeking_description": venue.seeking_description,
-    "image_link":venue.image_link,
-    "past_shows":past_shows,
-    "upcoming_shows":upcoming_shows,
-    "past_shows_count": len(past_shows),
-    "upcoming_shows_count": len(upcoming_shows)
-  })
+    "genres": venue.genres
+  } for venue in rows]
+  # a new show anywhere can take one of these venues off the list
+  cache_tags('venues', 'shows', *['venue:%d' % venue.id for venue in rows])
+  return render_template('pages/available_venues.html', form=form, venues=data, genres=genres, match=match,
+                         next_cursor=next_cursor, prev_cursor=prev_cursor)
 
-  data = list(filter(lambda d: d['id'] == venue_id,dataList))[0]
+@app.route('/venues/<int:venue_id>')
+@conditional_page(lambda venue_id: show_history_last_change(Venue, venue_id))
+@cached_page
+@replica_reads
+def show_venue(venue_id):
+  # shows the venue page with the given venue_id
+  data, next_change = venue_detail(venue_id)
+  cache_tags('venue:%d' % venue_id, 'venue-shows:%d' % venue_id,
+             *['artist:%d' % show["artist_id"] for show in data["past_shows"] + data["upcoming_shows"]])
+  cache_until(next_change)
   return render_template('pages/show_venue.html', venue=data)
 
 #  Create Venue
@@ -219,12 +947,12 @@ def create_venue_submission():
   try:
     db.session.add(venue)
     db.session.commit()
+    update_autocomplete_index('venue', venue.id, venue.name)
+    invalidate_pages('venues')
     flash('Venue ' + request.form['name'] + ' was successfully listed!')
   except:
     db.session.rollback()
     flash('Venue ' + request.form['name'] + ' was unsuccessfully listed!')
-  finally:
-    db.session.close()
 
   # on successful db insert, flash success
 
@@ -240,108 +968,64 @@ def delete_venue(venue_id):
     venue = Venue.query.get(venue_id)
     db.session.delete(venue)
     db.session.commit()
+    update_autocomplete_index('venue', int(venue_id))
+    invalidate_pages('venues', 'venue:%d' % int(venue_id))
   except:
     db.session.rollback()
-  finally:
-    db.session.close()
+    abort(500)
 
   # TODO: Complete this endpoint for taking a venue_id, and using
   # SQLAlchemy ORM to delete a record. Handle cases where the session commit could fail.
 
   # BONUS CHALLENGE: Implement a button to delete a Venue on a Venue Page, have it so that
   # clicking that button delete it from the db then redirect the user to the homepage
-  return None
+  return '', 204
 
 #  Artists
 #  ----------------------------------------------------------------
 @app.route('/artists')
+@conditional_page(lambda: last_change(Artist))
+@cached_page
+@replica_reads
 def artists():
-  artist_data = Artist.query.all()
+  genres, match = requested_genres()
+  artist_data, next_cursor, prev_cursor = paginate(
+    genre_filter(artist_listing_query(), Artist, genres, match), [Artist.id],
+    after=request.args.get('after'), before=request.args.get('before'))
   data = []
   for artist in artist_data:
     data.append({
       "id": artist.id,
       "name": artist.name
     })
-  # TODO: replace with real data returned from querying the database
+  cache_tags('artists', *['artist:%d' % artist.id for artist in artist_data])
 
-  return render_template('pages/artists.html', artists=data)
+  return render_template('pages/artists.html', artists=data, genres=genres, match=match,
+                         next_cursor=next_cursor, prev_cursor=prev_cursor)
 
 @app.route('/artists/search', methods=['POST'])
+@replica_reads
 def search_artists():
-  search_term = request.form.get("search_term")
-  show_artists = Artist.query.filter(Artist.name.ilike('%' + search_term + '%')).all()
-  data = []
-
-  count = 0
+  genres, match = requested_genres()
+  response = search_response(Artist, request.form.get('search_term', ''), genres, match)
+  return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''),
+                         genres=genres, match=match)
 
-  # TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
-  # seach for Hop should return "The Musical Hop".
-  # search for "Music" should return "The Musical Hop" and "Park Square Live Music & Coffee"
-  for search_artist in show_artists:
-    count += 1
-    data.append({
-      "id": search_artist.id,
-      "name": search_artist.name,
-    })
-
-  response = {
-    "count": count,
-    "data": data
-  }
-  # TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
-  # seach for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
-  # search for "band" should return "The Wild Sax Band".
-
-  return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''))
+@app.route('/artists/autocomplete')
+@replica_reads
+def autocomplete_artists():
+  return autocomplete_response('artist')
 
 @app.route('/artists/<int:artist_id>')
+@conditional_page(lambda artist_id: show_history_last_change(Artist, artist_id))
+@cached_page
+@replica_reads
 def show_artist(artist_id):
-  # shows the venue page with the given venue_id
-  # TODO: replace with real venue data from the venues table, using venue_id
-  artist = Artist.query.get(artist_id)
-  dataList = []
-  past_shows = []
-  upcoming_shows = []
-  current_time = datetime.now().strftime('%m/%d/%Y')
-  past_shows_query = Show.query.filter_by(artist_id=artist_id).filter(Show.start_time <= current_time).all()
-  upcoming_shows_query = Show.query.filter_by(artist_id=artist_id).filter(Show.start_time > current_time).all()
-
-  for show in past_shows_query:
-    venue = Venue.query.get(show.artist_id)
-    past_shows.append({
-      "venue_id": venue.id,
-      "venue_name": venue.name,
-      "venue_image_link": venue.image_link,
-      "start_time": show.start_time.strftime('%m/%d/%Y')
-    })
-  for show in upcoming_shows_query:
-    venue = Venue.query.get(show.artist_id)
-    upcoming_shows.append({
-      "venue_id": venue.id,
-      "venue_name": venue.name,
-      "artist_image_link": venue.image_link,
-      "start_time": show.start_time.strftime('%m/%d/%Y')
-    })
-  dataList.append({
-    "id": artist.id,
-    "name": artist.name,
-    "genres": artist.genres,
-    "city": artist.city,
-    "state": artist.state,
-    "phone": artist.phone,
-    "website": artist.website,
-    "facebook_link": artist.facebook_link,
-    "seeking_description": artist.seeking_description,
-    "image_link": artist.image_link,
-    "past_shows": past_shows,
-    "upcoming_shows": upcoming_shows,
-    "past_shows_count": len(past_shows),
-    "upcoming_shows_count": len(upcoming_shows)
-  })
-
-
-  data = list(filter(lambda d: d['id'] == artist_id, dataList))[0]
+  # shows the artist page with the given artist_id
+  data, next_change = artist_detail(artist_id)
+  cache_tags('artist:%d' % artist_id, 'artist-shows:%d' % artist_id,
+             *['venue:%d' % show["venue_id"] for show in data["past_shows"] + data["upcoming_shows"]])
+  cache_until(next_change)
   return render_template('pages/show_artist.html', artist=data)
 
 #  Update
@@ -386,12 +1070,12 @@ def edit_artist_submission(artist_id):
     artist.facebook_link = data["facebook_link"]
 
     db.session.commit()
+    update_autocomplete_index('artist', artist.id, artist.name)
+    invalidate_pages('artists', 'artist:%d' % artist_id)
     flash('Artist ' + request.form['name'] + ' was successfully listed!')
   except:
     db.session.rollback()
     flash('Artist ' + request.form['name'] + ' was unsuccessfully listed!')
-  finally:
-    db.session.close()
   # TODO: take values from the form submitted, and update existing
 
   # artist record with ID <artist_id> using the new attributes
@@ -442,12 +1126,12 @@ def edit_venue_submission(venue_id):
     venue.facebook_link = data["facebook_link"]
 
     db.session.commit()
+    update_autocomplete_index('venue', venue.id, venue.name)
+    invalidate_pages('venues', 'venue:%d' % venue_id)
     flash('Venue ' + request.form['name'] + ' was successfully listed!')
   except:
     db.session.rollback()
     flash('Venue ' + request.form['name'] + ' was unsuccessfully listed!')
-  finally:
-    db.session.close()
   # venue record with ID <venue_id> using the new attributes
   return redirect(url_for('show_venue', venue_id=venue_id))
 
@@ -479,12 +1163,12 @@ def create_artist_submission():
   try:
     db.session.add(artist)
     db.session.commit()
+    update_autocomplete_index('artist', artist.id, artist.name)
+    invalidate_pages('artists')
     flash('Artist ' + request.form['name'] + ' was successfully listed!')
   except:
     db.session.rollback()
     flash('Artist ' + request.form['name'] + ' was unsuccessfully listed!')
-  finally:
-    db.session.close()
   # on successful db insert, flash success
 
   # TODO: on unsuccessful db insert, flash an error instead.
@@ -496,23 +1180,20 @@ def create_artist_submission():
 #  ----------------------------------------------------------------
 
 @app.route('/shows')
+@conditional_page(lambda: last_change(Show, Venue, Artist))
+@cached_page
+@replica_reads
 def shows():
   # displays list of shows at /shows
   # TODO: replace with real venues data.
   #       num_shows should be aggregated based on number of upcoming shows per venue.
-  show_data=Show.query.all()
-  data =[]
-  for show in show_data:
-    data.append({
-      "venue_id": show.venue_id,
-      "venue_name": Venue.query.get(show.venue_id).name,
-      "artist_id": show.artist_id,
-      "artist_name": Artist.query.get(show.artist_id).name,
-      "artist_image_link": Artist.query.get(show.artist_id).image_link,
-      "start_time": show.start_time.strftime('%m/%d/%Y')
-    })
+  show_data, next_cursor, prev_cursor = paginate(
+    show_listing_query(), [Show.start_time, Show.id],
+    after=request.args.get('after'), before=request.args.get('before'))
+  data = [show_listing_row(show) for show in show_data]
+  cache_tags('shows', *['venue:%d' % show.venue_id for show in show_data] + ['artist:%d' % show.artist_id for show in show_data])
 
-  return render_template('pages/shows.html', shows=data)
+  return render_template('pages/shows.html', shows=data, next_cursor=next_cursor, prev_cursor=prev_cursor)
 
 @app.route('/shows/create')
 def create_shows():
@@ -535,25 +1216,187 @@ def create_show_submission():
   try:
     db.session.add(show)
     db.session.commit()
+    invalidate_pages('shows', 'venue-shows:%d' % show.venue_id, 'artist-shows:%d' % show.artist_id)
     flash('Show was successfully listed!')
   except:
     db.session.rollback()
     flash('Show was unsuccessfully listed!')
-  finally:
-    db.session.close()
 
   # TODO: on unsuccessful db insert, flash an error instead.
   # e.g., flash('An error occurred. Show could not be listed.')
   # see: http://flask.pocoo.org/docs/1.0/patterns/flashing/
   return render_template('pages/home.html')
 
+#  Stats
+#  ----------------------------------------------------------------
+
+@app.route('/stats')
+@replica_reads
+def stats():
+  return render_template('pages/stats.html', stats=stats_summary(datetime.now().date()))
+
+#  API
+#  ----------------------------------------------------------------
+
+# Read-only JSON views of the same queries the pages use. Collections are
+# streamed from a server-side cursor (yield_per) in chunks of API_CHUNK_ROWS
+# rows, as one JSON array or, with ?format=ndjson or an
+# `Accept: application/x-ndjson` header, one object per line; memory use
+# does not grow with the table.
+
+def stream_collection(query, serialize):
+  ndjson = (request.args.get('format') == 'ndjson' or
+            request.accept_mimetypes.best == 'application/x-ndjson')
+  chunk_rows = app.config['API_CHUNK_ROWS']
+  separator = '\n' if ndjson else ','
+
+  def generate():
+    if not ndjson:
+      yield '['
+    chunk = []
+    first = True
+    for row in query.yield_per(chunk_rows):
+      chunk.append(json.dumps(serialize(row)))
+      if len(chunk) == chunk_rows:
+        yield ('' if first else separator) + separator.join(chunk)
+        first = False
+        chunk = []
+    if chunk:
+      yield ('' if first else separator) + separator.join(chunk)
+    yield '\n' if ndjson else ']'
+
+  return Response(stream_with_context(generate()),
+                  mimetype='application/x-ndjson' if ndjson else 'application/json')
+
+@app.route('/api/v1/venues')
+@replica_reads
+def api_venues():
+  current_time = datetime.now().date()
+  query = genre_filter(venue_directory_query(current_time), Venue, *requested_genres())
+  return stream_collection(query, lambda venue: {
+    "id": venue.id,
+    "name": venue.name,
+    "city": venue.city,
+    "state": venue.state,
+    "num_upcoming_shows": venue.num_upcoming_shows
+  })
+
+@app.route('/api/v1/venues/available')
+@replica_reads
+def api_available_venues():
+  query = genre_filter(available_venues_query(*requested_availability()), Venue, *requested_genres())
+  return stream_collection(query, lambda venue: {
+    "id": venue.id,
+    "name": venue.name,
+    "address": venue.address,
+    "genres": venue.genres
+  })
+
+@app.route('/api/v1/venues/<int:venue_id>')
+@replica_reads
+def api_venue(venue_id):
+  return jsonify(venue_detail(venue_id)[0])
+
+@app.route('/api/v1/artists')
+@replica_reads
+def api_artists():
+  query = genre_filter(artist_listing_query(), Artist, *requested_genres())
+  return stream_collection(query, lambda artist: {
+    "id": artist.id,
+    "name": artist.name
+  })
+
+@app.route('/api/v1/artists/<int:artist_id>')
+@replica_reads
+def api_artist(artist_id):
+  return jsonify(artist_detail(artist_id)[0])
+
+@app.route('/api/v1/shows')
+@replica_reads
+def api_shows():
+  return stream_collection(show_listing_query(), show_listing_row)
+
+@app.route('/api/v1/stats')
+@replica_reads
+def api_stats():
+  return jsonify(stats_summary(datetime.now().date()))
+
+@app.route('/api/v1/shows/export.csv')
+@replica_reads
+def api_shows_export():
+  # the whole show calendar as CSV, streamed EXPORT_CHUNK_ROWS rows at a time
+  chunks = export_chunks(show_export_query(), [Show.start_time, Show.id], ['start_time', 'show_id'])
+  response = Response(stream_with_context(exporter.csv_chunks(exporter.SHOW_COLUMNS, chunks)),
+                      mimetype='text/csv')
+  response.headers['Content-Disposition'] = 'attachment; filename=shows.csv'
+  return response
+
+#  Commands
+#  ----------------------------------------------------------------
+
+@app.cli.command('import')
+@click.argument('kind', type=click.Choice(['venues', 'artists', 'shows']))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--batch-size', default=10000, show_default=True, help='records per transaction')
+@click.option('--rejects', 'rejects_path', type=click.Path(dir_okay=False),
+              help='CSV report of rejected records (default: PATH.rejects.csv)')
+@click.option('--restart', is_flag=True, help='ignore the checkpoint and start from the first record')
+@click.option('--no-copy', is_flag=True, help='insert with executemany instead of COPY')
+def import_command(kind, path, batch_size, rejects_path, restart, no_copy):
+  """Bulk-load venues, artists or shows from a CSV or NDJSON file."""
+  importer = Importer(db, {'venues': Venue, 'artists': Artist, 'shows': Show}, ImportCheckpoint,
+                      batch_size=batch_size, use_copy=False if no_copy else None,
+                      log=lambda message: click.echo(message, err=True))
+  counts = importer.run(kind, path, rejects_path, restart)
+  click.echo('%(inserted)d inserted, %(rejected)d rejected, %(skipped)d already imported' % counts)
+  if page_cache is not None:
+    page_cache.clear()
+
+@app.cli.command('export-shows')
+@click.argument('path', type=click.Path(dir_okay=False, allow_dash=True))
+@click.option('--format', 'format', type=click.Choice(exporter.FORMATS),
+              help='output format (default: from the PATH extension, else csv)')
+@click.option('--chunk-rows', type=int, help='rows per query and per write (default: EXPORT_CHUNK_ROWS)')
+def export_shows_command(path, format, chunk_rows):
+  """Export the show calendar with venue and artist names to CSV or Parquet."""
+  format = format or ('parquet' if path.endswith('.parquet') else 'csv')
+  if format == 'parquet' and (exporter.pyarrow is None or path == '-'):
+    raise click.UsageError('parquet export needs pyarrow and a file PATH')
+  chunks = export_chunks(show_export_query(), [Show.start_time, Show.id], ['start_time', 'show_id'],
+                         chunk_rows)
+  if path == '-':
+    rows = exporter.write_csv(exporter.SHOW_COLUMNS, chunks, click.get_text_stream('stdout'))
+  else:
+    # written beside PATH and renamed into place, so readers never see a partial file
+    partial = path + '.part'
+    if format == 'parquet':
+      rows = exporter.write_parquet(exporter.SHOW_COLUMNS, chunks, partial)
+    else:
+      with open(partial, 'w', newline='') as f:
+        rows = exporter.write_csv(exporter.SHOW_COLUMNS, chunks, f)
+    os.replace(partial, path)
+  click.echo('%d shows exported' % rows, err=True)
+
+# errors on the JSON API are answered in JSON, {"error": description}
+def api_error(error):
+    if request.path.startswith('/api/'):
+        # keeps the exception's headers, such as Allow on a 405
+        response = error.get_response()
+        response.data = json.dumps({"error": error.description})
+        response.content_type = 'application/json'
+        return response
+
+@app.errorhandler(HTTPException)
+def http_error(error):
+    return api_error(error) or error
+
 @app.errorhandler(404)
 def not_found_error(error):
-    return render_template('errors/404.html'), 404
+    return api_error(error) or (render_template('errors/404.html'), 404)
 
 @app.errorhandler(500)
 def server_error(error):
-    return render_template('errors/500.html'), 500
+    return api_error(error) or (render_template('errors/500.html'), 500)
 
 
 if not app.debug:
@@ -0,0 +1,181 @@
+import asyncio
+import io
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.util import await_only, greenlet_spawn
+from werkzeug.exceptions import HTTPException
+
+from app import app, db
+from routing import RoutingSession
+
+# Async serving mode:
+#
+#     uvicorn asgi:application
+#
+# Read-only views (those marked by @replica_reads) run on the event loop:
+# each request runs the Flask app in its own greenlet with a database
+# session bound to the sync facade of an asyncpg AsyncEngine, so a query
+# suspends only that request's greenlet while Postgres answers. The response
+# body is sent from the same greenlet chunk by chunk, which keeps streamed
+# responses together with their session and lets a slow client hold a
+# connection without holding a thread. Every other request goes to a thread
+# pool running the app as plain WSGI on the regular psycopg2 engine.
+#
+# Needs asyncpg and an ASGI server such as uvicorn.
+
+POOL_OPTIONS = ('pool_size', 'max_overflow', 'pool_timeout', 'pool_recycle', 'pool_pre_ping')
+
+
+def create_engine(uri):
+    options = {key: value for key, value in app.config['SQLALCHEMY_ENGINE_OPTIONS'].items()
+               if key in POOL_OPTIONS}
+    if app.config['DB_STATEMENT_TIMEOUT_MS']:
+        options['connect_args'] = {'server_settings': {
+            'statement_timeout': str(app.config['DB_STATEMENT_TIMEOUT_MS'])}}
+    return create_async_engine(make_url(uri).set(drivername='postgresql+asyncpg'), **options)
+
+
+def wsgi_string(text):
+    # ASGI paths are decoded already; WSGI wants their UTF-8 bytes as latin-1
+    return text.encode('utf-8').decode('latin-1')
+
+
+def wsgi_environ(scope, body):
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': wsgi_string(scope.get('root_path', '')),
+        'PATH_INFO': wsgi_string(scope['path']),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': 'HTTP/%s' % scope['http_version'],
+        'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+        elif name != 'CONTENT_LENGTH':
+            key = 'HTTP_' + name
+            environ[key] = environ[key] + ',' + value if key in environ else value
+    return environ
+
+
+def read_only(environ):
+    # a request the URL map cannot match, or even parse, goes to the thread
+    # pool, where the app answers it with its error page
+    try:
+        endpoint, _ = app.url_map.bind_to_environ(environ).match()
+    except HTTPException:
+        return False
+    except Exception:
+        app.logger.exception('routing %r', environ['PATH_INFO'])
+        return False
+    return getattr(app.view_functions.get(endpoint), 'read_only', False)
+
+
+class Application(object):
+
+    def __init__(self, threads=None):
+        self.threads = ThreadPoolExecutor(threads)
+        self.engine = None
+        self.replica_engines = None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            if self.engine is None:
+                self.start()
+            body = await self.read_body(receive)
+            environ = wsgi_environ(scope, body)
+            if read_only(environ):
+                await greenlet_spawn(self.serve_in_greenlet, environ, send)
+            else:
+                await self.serve_in_thread(environ, send)
+
+    def start(self):
+        self.engine = create_engine(app.config['SQLALCHEMY_DATABASE_URI'])
+        self.replica_engines = {bind: create_engine(uri)
+                                for bind, uri in (app.config.get('SQLALCHEMY_BINDS') or {}).items()
+                                if bind in db.replicas(app)}
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                self.start()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                for engine in [self.engine] + list(self.replica_engines.values()):
+                    await engine.dispose()
+                self.threads.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def read_body(self, receive):
+        body = b''
+        while True:
+            message = await receive()
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                return body
+
+    def serve_in_greenlet(self, environ, send):
+        # db.session is scoped to the current greenlet, so this request's
+        # session is the asyncpg-backed one for its whole lifetime, including
+        # streamed bodies; the app-context teardown removes it.
+        db.session.registry.set(RoutingSession(
+            db, bind=self.engine.sync_engine, binds={},
+            replica_engines={bind: engine.sync_engine for bind, engine in self.replica_engines.items()}))
+        try:
+            status, headers, app_iter = self.call_app(environ)
+            try:
+                await_only(send({'type': 'http.response.start', 'status': status, 'headers': headers}))
+                for chunk in app_iter:
+                    if chunk:
+                        await_only(send({'type': 'http.response.body', 'body': chunk, 'more_body': True}))
+                await_only(send({'type': 'http.response.body', 'body': b''}))
+            finally:
+                if hasattr(app_iter, 'close'):
+                    app_iter.close()
+        finally:
+            db.session.remove()
+
+    async def serve_in_thread(self, environ, send):
+        def run():
+            status, headers, app_iter = self.call_app(environ)
+            try:
+                return status, headers, b''.join(app_iter)
+            finally:
+                if hasattr(app_iter, 'close'):
+                    app_iter.close()
+        status, headers, body = await asyncio.get_running_loop().run_in_executor(self.threads, run)
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': body})
+
+    def call_app(self, environ):
+        started = []
+
+        def start_response(status, headers, exc_info=None):
+            started[:] = [int(status.split(' ', 1)[0]),
+                          [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                           for name, value in headers]]
+        app_iter = app.wsgi_app(environ, start_response)
+        return started[0], started[1], app_iter
+
+
+application = Application()
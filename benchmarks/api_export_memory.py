@@ -0,0 +1,47 @@
+"""Peak memory of streaming the full /api/v1/shows or shows CSV export.
+
+Seeds an increasing number of shows and consumes the streamed response
+chunk by chunk, reporting the peak Python allocation (tracemalloc). With the
+server-side cursor the peak should stay flat as the table grows.
+
+    python benchmarks/api_export_memory.py --sizes 10000 100000 1000000
+"""
+import argparse
+import sys
+import tracemalloc
+
+import common
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    common.add_database_argument(parser)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--format', choices=['json', 'ndjson', 'csv'], default='ndjson')
+    args = parser.parse_args()
+
+    fyyur = common.load_app(args.database_url)
+    client = fyyur.app.test_client()
+    url = ('/api/v1/shows/export.csv' if args.format == 'csv'
+           else '/api/v1/shows?format=' + args.format)
+    with fyyur.app.app_context():
+        print('%10s %14s %14s' % ('shows', 'bytes', 'peak KiB'))
+        for size in args.sizes:
+            common.seed(fyyur, n_venues=1000, n_artists=1000, n_shows=size)
+            try:
+                tracemalloc.start()
+                response = client.get(url, buffered=False)
+                total = 0
+                for chunk in response.response:
+                    total += len(chunk)
+                response.close()
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            finally:
+                common.cleanup(fyyur)
+            print('%10d %14d %14.1f' % (size, total, peak / 1024.0))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,54 @@
+"""Build time, memory and query latency of the autocomplete prefix index.
+
+Needs no database: names are generated the same way ``common.seed`` does.
+
+    python benchmarks/autocomplete_index.py --names 100000
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+import common
+from search_index import PrefixIndex
+
+QUERIES = ['v', 've', 'vel', 'velvet', 'velvet ow', 'thunder 12', 'thunder 1', 'b p 1', 'hop', 'zzz']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--names', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=1000)
+    parser.add_argument('--limit', type=int, default=10)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    names = [common._name(rng, 'artist', i) for i in range(args.names)]
+
+    tracemalloc.start()
+    index = PrefixIndex()
+    start = time.perf_counter()
+    for i, name in enumerate(names):
+        index.add('artist', i, name)
+    build = time.perf_counter() - start
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    print('%d names: build %.2f s, %.1f MiB' % (args.names, build, size / 1048576.0))
+    print('%-14s %10s %10s %8s' % ('query', 'p50 us', 'p99 us', 'hits'))
+    for query in QUERIES:
+        samples = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            hits = index.search('artist', query, args.limit)
+            samples.append((time.perf_counter() - start) * 1e6)
+        samples.sort()
+        print('%-14s %10.1f %10.1f %8d' % (query, statistics.median(samples),
+                                           samples[int(len(samples) * 0.99) - 1], len(hits)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
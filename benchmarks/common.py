@@ -0,0 +1,212 @@
+"""Shared helpers for the Fyyur benchmark scripts.
+
+The scripts import the application module directly and run against whatever
+database ``SQLALCHEMY_DATABASE_URI`` points at (override it with
+``--database-url``).  Seeded rows are tagged with ``BENCH_PREFIX`` so they can
+be removed again without touching real data.
+
+Run them from the project root, e.g. ``python benchmarks/shows_query_count.py``.
+"""
+import asyncio
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from sqlalchemy import event
+
+BENCH_PREFIX = 'bench-'
+
+GENRES = ['Alternative', 'Blues', 'Classical', 'Country', 'Electronic', 'Folk',
+          'Funk', 'Hip-Hop', 'Heavy Metal', 'Instrumental', 'Jazz',
+          'Musical Theatre', 'Pop', 'Punk', 'R&B', 'Reggae', 'Rock n Roll',
+          'Soul', 'Other']
+WORDS = ['Velvet', 'Electric', 'Midnight', 'Golden', 'Rusty', 'Silent', 'Wild',
+         'Crimson', 'Lunar', 'Hollow', 'Sax', 'Owls', 'Petals', 'Harbor', 'Echo',
+         'Lantern', 'Tigers', 'Parade', 'Garden', 'Hop', 'Cellar', 'Static',
+         'Drifters', 'Comets', 'Anchor', 'Orchid', 'Thunder', 'Bayou']
+CITIES = [('San Francisco', 'CA'), ('New York', 'NY'), ('Austin', 'TX'),
+          ('Seattle', 'WA'), ('Chicago', 'IL'), ('Nashville', 'TN'),
+          ('Denver', 'CO'), ('Portland', 'OR')]
+
+
+def load_app(database_url=None, page_cache=False):
+    """Import the app, pointing it at ``database_url`` when one is given.
+
+    The page cache is switched off unless ``page_cache`` is set: seeding
+    writes rows behind its back, so it would serve pages from an earlier
+    run, and a timed request would measure a cache hit rather than the
+    controller.
+    """
+    import app as fyyur
+    if database_url:
+        import config
+        fyyur.app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+        fyyur.app.config['SQLALCHEMY_ENGINE_OPTIONS'] = config.engine_options(database_url)
+    if not page_cache:
+        fyyur.page_cache = None
+    return fyyur
+
+
+def add_database_argument(parser):
+    parser.add_argument('--database-url', default=os.environ.get('DATABASE_URL'),
+                        help='database to benchmark against (default: config.py)')
+
+
+def seed(fyyur, n_venues, n_artists, n_shows, rng_seed=0, batch_size=5000):
+    """Insert synthetic venues, artists and shows; returns (venue_ids, artist_ids)."""
+    db, Venue, Artist, Show = fyyur.db, fyyur.Venue, fyyur.Artist, fyyur.Show
+    rng = random.Random(rng_seed)
+    today = date.today()
+
+    venues = []
+    for i in range(n_venues):
+        city, state = rng.choice(CITIES)
+        venues.append({
+            'name': _name(rng, 'venue', i), 'city': city, 'state': state,
+            'address': '%d Main St' % i, 'phone': '555-555-5555',
+            'genres': rng.sample(GENRES, 2),
+            'image_link': 'https://example.com/venue/%d.jpg' % i,
+        })
+    artists = []
+    for i in range(n_artists):
+        city, state = rng.choice(CITIES)
+        artists.append({
+            'name': _name(rng, 'artist', i), 'city': city, 'state': state,
+            'phone': '555-555-5555', 'genres': rng.sample(GENRES, 2),
+            'image_link': 'https://example.com/artist/%d.jpg' % i,
+        })
+    _insert(db, Venue.__table__, venues, batch_size)
+    _insert(db, Artist.__table__, artists, batch_size)
+    db.session.commit()
+
+    venue_ids = [row.id for row in db.session.query(Venue.id).filter(
+        Venue.name.like(BENCH_PREFIX + '%'))]
+    artist_ids = [row.id for row in db.session.query(Artist.id).filter(
+        Artist.name.like(BENCH_PREFIX + '%'))]
+
+    batch = []
+    for _ in range(n_shows):
+        batch.append({
+            'venue_id': rng.choice(venue_ids),
+            'artist_id': rng.choice(artist_ids),
+            'start_time': today + timedelta(days=rng.randint(-365, 365)),
+        })
+        if len(batch) >= batch_size:
+            _insert(db, Show.__table__, batch, batch_size)
+            batch = []
+    _insert(db, Show.__table__, batch, batch_size)
+    db.session.commit()
+    return venue_ids, artist_ids
+
+
+def generate_shows(fyyur, n_shows, rng_seed=0.5, batch_size=500000):
+    """Insert ``n_shows`` shows between the seeded venues and artists.
+
+    The rows are generated inside Postgres (``generate_series``), which
+    keeps 10M-show seeds to minutes; dates fall within a year of today.
+    """
+    db = fyyur.db
+    db.session.execute('SELECT setseed(:seed)', {'seed': rng_seed})
+    for start in range(0, n_shows, batch_size):
+        # a batch can outlast the app's DB_STATEMENT_TIMEOUT_MS
+        db.session.execute('SET LOCAL statement_timeout = 0')
+        db.session.execute('''
+            INSERT INTO "Show" (venue_id, artist_id, start_time)
+            SELECT v.ids[1 + floor(random() * array_length(v.ids, 1))::int],
+                   a.ids[1 + floor(random() * array_length(a.ids, 1))::int],
+                   current_date + floor(random() * 731)::int - 365
+            FROM generate_series(1, :n),
+                 (SELECT array_agg(id) AS ids FROM "Venue" WHERE name LIKE :prefix) v,
+                 (SELECT array_agg(id) AS ids FROM "Artist" WHERE name LIKE :prefix) a
+        ''', {'n': min(batch_size, n_shows - start), 'prefix': BENCH_PREFIX + '%'})
+        db.session.commit()
+
+
+def _name(rng, kind, i):
+    return '%s%s %s %s %d' % (BENCH_PREFIX, kind, rng.choice(WORDS), rng.choice(WORDS), i)
+
+
+def _insert(db, table, rows, batch_size):
+    for start in range(0, len(rows), batch_size):
+        db.session.execute(table.insert(), rows[start:start + batch_size])
+
+
+def cleanup(fyyur):
+    """Delete every row created by ``seed``."""
+    db, Venue, Artist, Show = fyyur.db, fyyur.Venue, fyyur.Artist, fyyur.Show
+    # large seeds take longer to delete than the app's DB_STATEMENT_TIMEOUT_MS
+    db.session.execute('SET LOCAL statement_timeout = 0')
+    venue_ids = db.session.query(Venue.id).filter(Venue.name.like(BENCH_PREFIX + '%'))
+    artist_ids = db.session.query(Artist.id).filter(Artist.name.like(BENCH_PREFIX + '%'))
+    Show.query.filter(Show.venue_id.in_(venue_ids) |
+                      Show.artist_id.in_(artist_ids)).delete(synchronize_session=False)
+    Venue.query.filter(Venue.name.like(BENCH_PREFIX + '%')).delete(synchronize_session=False)
+    Artist.query.filter(Artist.name.like(BENCH_PREFIX + '%')).delete(synchronize_session=False)
+    db.session.commit()
+
+
+class QueryCounter(object):
+    """Counts the statements sent to the engine while the block runs."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._before_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._before_execute)
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of ``values`` (nan when empty)."""
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)] if values else float('nan')
+
+
+async def http_request(port, method, path, body=None):
+    """Send one HTTP/1.1 request to 127.0.0.1:``port`` on a new connection
+    and read the whole response; returns the status code (0 if none).
+    ``body`` is a form-encoded string."""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    try:
+        head = '%s %s HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n' % (method, path)
+        if body is not None:
+            body = body.encode()
+            head += 'Content-Type: application/x-www-form-urlencoded\r\nContent-Length: %d\r\n' % len(body)
+        writer.write(head.encode() + b'\r\n' + (body or b''))
+        await writer.drain()
+        response = await reader.read()
+    finally:
+        writer.close()
+    return int(response.split(b' ', 2)[1]) if response else 0
+
+
+def wait_for_port(port, path='/api/v1/artists', timeout=20):
+    """Wait until a server on ``port`` answers ``path`` with 200."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if asyncio.run(http_request(port, 'GET', path)) == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError('server on port %d did not start' % port)
@@ -0,0 +1,298 @@
+"""Times every controller in app.py at a chosen data scale.
+
+Seeds --shows shows between --venues venues and --artists artists (by
+default one venue and one artist per 100 shows), then sends each
+controller --repeat requests through the Flask test client, reading the
+whole body. Routes taking an id get a random seeded row on each request. For each controller it reports latency percentiles, the statements run
+by one request and that request's peak Python allocation (tracemalloc), and
+with --output writes the lot as JSON. --compare BASELINE.json sets the
+results beside an earlier run, e.g. of the parent commit, and exits 1 if a
+controller got slower by more than --threshold or runs more statements.
+
+The page cache is switched off (--page-cache keeps it) and the slow-query
+log is silenced, so the numbers are those of the controllers themselves.
+
+    python benchmarks/controllers.py --shows 100000 --output before.json
+    git checkout my-branch
+    python benchmarks/controllers.py --shows 100000 --output after.json --compare before.json
+"""
+import argparse
+import json
+import logging
+import random
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+import common
+
+
+def case(method, path, data=None, setup=None, status=200):
+    # path and data are callables taking (context, rng), or constants;
+    # setup(context) runs before each request, untimed, and returns extra
+    # context for path/data
+    return {'method': method, 'path': path, 'data': data, 'setup': setup, 'status': status}
+
+
+def venue_form(context, rng):
+    return {'name': common.BENCH_PREFIX + 'edited venue %d' % rng.randrange(10 ** 6),
+            'city': 'Austin', 'state': 'TX', 'address': '1 Main St', 'phone': '555-555-5555',
+            'genres': rng.sample(common.GENRES, 2), 'facebook_link': ''}
+
+
+def artist_form(context, rng):
+    return {'name': common.BENCH_PREFIX + 'edited artist %d' % rng.randrange(10 ** 6),
+            'city': 'Austin', 'state': 'TX', 'phone': '555-555-5555',
+            'genres': rng.sample(common.GENRES, 2), 'facebook_link': ''}
+
+
+def show_form(context, rng):
+    return {'venue_id': rng.choice(context['venue_ids']), 'artist_id': rng.choice(context['artist_ids']),
+            'start_time': (date.today() + timedelta(days=rng.randint(1, 365))).isoformat()}
+
+
+def spare_venue(context):
+    # a venue without shows, for delete_venue to remove
+    fyyur = context['fyyur']
+    venue = fyyur.Venue(name=common.BENCH_PREFIX + 'spare venue', city='Austin', state='TX')
+    fyyur.db.session.add(venue)
+    fyyur.db.session.commit()
+    venue_id = venue.id
+    fyyur.db.session.remove()
+    return {'spare_venue_id': venue_id}
+
+
+def venue_path(pattern):
+    return lambda context, rng: pattern % rng.choice(context['venue_ids'])
+
+
+def artist_path(pattern):
+    return lambda context, rng: pattern % rng.choice(context['artist_ids'])
+
+
+def available_path(prefix):
+    def path(context, rng):
+        city, state = rng.choice(common.CITIES)
+        start = date.today() + timedelta(days=rng.randint(0, 300))
+        return '%s?city=%s&state=%s&from=%s&to=%s' % (
+            prefix, city.replace(' ', '+'), state, start, start + timedelta(days=6))
+    return path
+
+
+def search(context, rng):
+    return {'search_term': rng.choice(common.WORDS).lower()}
+
+
+# endpoint name -> request; every endpoint of the app except 'static' must
+# be listed here (the run stops otherwise)
+CASES = {
+    'index': case('GET', '/'),
+    'venues': case('GET', '/venues'),
+    'search_venues': case('POST', '/venues/search', search),
+    'autocomplete_venues': case('GET', lambda context, rng: '/venues/autocomplete?q=%s' % (
+        rng.choice(common.WORDS)[:3].lower())),
+    'available_venues': case('GET', available_path('/venues/available')),
+    'show_venue': case('GET', venue_path('/venues/%d')),
+    'create_venue_form': case('GET', '/venues/create'),
+    'create_venue_submission': case('POST', '/venues/create', venue_form),
+    'delete_venue': case('DELETE', lambda context, rng: '/venues/%d' % context['spare_venue_id'],
+                         setup=spare_venue, status=204),
+    'edit_venue': case('GET', venue_path('/venues/%d/edit')),
+    'edit_venue_submission': case('POST', venue_path('/venues/%d/edit'), venue_form, status=302),
+    'artists': case('GET', '/artists'),
+    'search_artists': case('POST', '/artists/search', search),
+    'autocomplete_artists': case('GET', lambda context, rng: '/artists/autocomplete?q=%s' % (
+        rng.choice(common.WORDS)[:3].lower())),
+    'show_artist': case('GET', artist_path('/artists/%d')),
+    'create_artist_form': case('GET', '/artists/create'),
+    'create_artist_submission': case('POST', '/artists/create', artist_form),
+    'edit_artist': case('GET', artist_path('/artists/%d/edit')),
+    'edit_artist_submission': case('POST', artist_path('/artists/%d/edit'), artist_form, status=302),
+    'shows': case('GET', '/shows'),
+    'create_shows': case('GET', '/shows/create'),
+    'create_show_submission': case('POST', '/shows/create', show_form),
+    'stats': case('GET', '/stats'),
+    'api_venues': case('GET', '/api/v1/venues'),
+    'api_available_venues': case('GET', available_path('/api/v1/venues/available')),
+    'api_venue': case('GET', venue_path('/api/v1/venues/%d')),
+    'api_artists': case('GET', '/api/v1/artists'),
+    'api_artist': case('GET', artist_path('/api/v1/artists/%d')),
+    'api_shows': case('GET', '/api/v1/shows'),
+    'api_stats': case('GET', '/api/v1/stats'),
+    'api_shows_export': case('GET', '/api/v1/shows/export.csv'),
+    'cache_stats': case('GET', '/cache/stats', status=404),
+    'pool_stats': case('GET', '/pool/stats'),
+    'metrics': case('GET', '/metrics'),
+}
+
+
+def prepare(context, rng, spec):
+    if spec['setup']:
+        context = dict(context, **spec['setup'](context))
+    path = spec['path'](context, rng) if callable(spec['path']) else spec['path']
+    data = spec['data'](context, rng) if callable(spec['data']) else spec['data']
+    return path, data
+
+
+def send(client, method, path, data):
+    started = time.perf_counter()
+    # read the body chunk by chunk without keeping it, so streamed
+    # responses are measured the way a client consumes them
+    response = client.open(path, method=method, data=data, buffered=False)
+    for _ in response.iter_encoded():
+        pass
+    elapsed = time.perf_counter() - started
+    response.close()
+    return response.status_code, elapsed
+
+
+def run(fyyur, context, endpoints, repeat, rng):
+    client = fyyur.app.test_client()
+    results, failures = {}, []
+    for endpoint in endpoints:
+        spec = CASES[endpoint]
+        # warm up templates, statement and index caches
+        send(client, spec['method'], *prepare(context, rng, spec))
+        samples = []
+        for _ in range(repeat):
+            path, data = prepare(context, rng, spec)
+            status, elapsed = send(client, spec['method'], path, data)
+            if status != spec['status']:
+                failures.append('%s %s -> %d (expected %d)' % (spec['method'], path, status, spec['status']))
+                break
+            samples.append(elapsed * 1000)
+        path, data = prepare(context, rng, spec)
+        with common.QueryCounter(fyyur.db.engine) as counter:
+            tracemalloc.start()
+            status, _ = send(client, spec['method'], path, data)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        results[endpoint] = {
+            'method': spec['method'],
+            'path': path,
+            'status': status,
+            'p50_ms': common.percentile(samples, 0.5),
+            'p95_ms': common.percentile(samples, 0.95),
+            'p99_ms': common.percentile(samples, 0.99),
+            'queries': counter.count,
+            'peak_kib': peak / 1024.0,
+        }
+        print('%-26s %9.2f %9.2f %9.2f %8d %10.0f' % (
+            endpoint, results[endpoint]['p50_ms'], results[endpoint]['p95_ms'],
+            results[endpoint]['p99_ms'], counter.count, peak / 1024.0))
+    return results, failures
+
+
+def compare(results, baseline, threshold):
+    # lines for controllers that got slower (p50 or p95 beyond threshold)
+    # or run more statements than in baseline
+    regressions = []
+    print('\n%-26s %12s %12s %10s' % ('vs. baseline', 'p50 ratio', 'p95 ratio', 'queries'))
+    for endpoint, result in sorted(results.items()):
+        before = baseline['controllers'].get(endpoint)
+        if before is None:
+            continue
+        p50 = result['p50_ms'] / before['p50_ms'] if before['p50_ms'] else float('nan')
+        p95 = result['p95_ms'] / before['p95_ms'] if before['p95_ms'] else float('nan')
+        queries = result['queries'] - before['queries']
+        print('%-26s %12.2f %12.2f %+10d' % (endpoint, p50, p95, queries))
+        if p50 > threshold or p95 > threshold or queries > 0:
+            regressions.append(endpoint)
+    return regressions
+
+
+def git_commit():
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=common.ROOT,
+                                         stderr=subprocess.DEVNULL).decode().strip()
+        dirty = subprocess.call(['git', 'diff', '--quiet', 'HEAD'], cwd=common.ROOT,
+                                stderr=subprocess.DEVNULL)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ('-dirty' if dirty else '')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    common.add_database_argument(parser)
+    parser.add_argument('--shows', type=int, default=10000, help='shows to seed (1k to 10M)')
+    parser.add_argument('--venues', type=int, help='venues to seed (default: shows / 100, at least 100)')
+    parser.add_argument('--artists', type=int, help='artists to seed (default: shows / 100, at least 100)')
+    parser.add_argument('--repeat', type=int, default=20, help='timed requests per controller')
+    parser.add_argument('--only', nargs='+', choices=sorted(CASES), metavar='ENDPOINT',
+                        help='time these controllers only')
+    parser.add_argument('--page-cache', action='store_true', help='leave the page cache on')
+    parser.add_argument('--rng-seed', type=int, default=0)
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--compare', metavar='BASELINE', help='JSON results of an earlier run')
+    parser.add_argument('--threshold', type=float, default=1.2,
+                        help='latency ratio over the baseline counted as a regression')
+    args = parser.parse_args()
+    n_venues = args.venues or max(args.shows // 100, 100)
+    n_artists = args.artists or max(args.shows // 100, 100)
+
+    fyyur = common.load_app(args.database_url, page_cache=args.page_cache)
+    app = fyyur.app
+    missing = sorted(rule.endpoint for rule in app.url_map.iter_rules()
+                     if rule.endpoint != 'static' and rule.endpoint not in CASES)
+    if missing:
+        print('no benchmark case for: %s' % ', '.join(missing))
+        return 1
+    app.config['WTF_CSRF_ENABLED'] = False
+    app.config['SQL_SLOW_MS'] = float('inf')
+    app.logger.setLevel(logging.INFO)  # no per-request SQL summaries
+
+    rng = random.Random(args.rng_seed)
+    with app.app_context():
+        try:
+            started = time.perf_counter()
+            venue_ids, artist_ids = common.seed(fyyur, n_venues=n_venues, n_artists=n_artists, n_shows=0,
+                                                rng_seed=args.rng_seed)
+            common.generate_shows(fyyur, args.shows)
+            fyyur.db.session.execute('ANALYZE "Venue"; ANALYZE "Artist"; ANALYZE "Show"')
+            fyyur.db.session.commit()
+            print('seeded %d venues, %d artists, %d shows in %.0f s\n' % (
+                n_venues, n_artists, args.shows, time.perf_counter() - started))
+            context = {'fyyur': fyyur, 'venue_ids': venue_ids, 'artist_ids': artist_ids}
+            print('%-26s %9s %9s %9s %8s %10s' % (
+                'controller', 'p50 ms', 'p95 ms', 'p99 ms', 'queries', 'peak KiB'))
+            results, failures = run(fyyur, context, args.only or list(CASES), args.repeat, rng)
+            database = fyyur.db.session.execute('SHOW server_version').scalar()
+            fyyur.db.session.rollback()
+        finally:
+            fyyur.db.session.rollback()
+            common.cleanup(fyyur)
+
+    report = {
+        'commit': git_commit(),
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'postgres': database,
+        'scale': {'venues': n_venues, 'artists': n_artists, 'shows': args.shows},
+        'repeat': args.repeat,
+        'page_cache': args.page_cache,
+        'max_rss_kib': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'controllers': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    for failure in failures:
+        print('FAILED %s' % failure)
+    regressions = []
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline['scale'] != report['scale']:
+            print('\nnote: baseline scale %(venues)d/%(artists)d/%(shows)d differs' % baseline['scale'])
+        regressions = compare(results, baseline, args.threshold)
+        for endpoint in regressions:
+            print('REGRESSED %s' % endpoint)
+    return 1 if failures or regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,74 @@
+"""Render time of 10k show rows through the `datetime` Jinja filter.
+
+Compares the original filter (dateutil parse + babel format on every call,
+fed ISO strings) with the current one (native dates, compiled patterns,
+memoized output). Needs no database.
+
+    python benchmarks/datetime_filter.py --rows 10000
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+import babel.dates
+import dateutil.parser
+
+import common
+
+ROW_TEMPLATE = ('{% for show in shows %}<div class="tile tile-show">'
+                '<h4>{{ show.start_time|datetime("full") }}</h4>'
+                '<h5>{{ show.artist_name }}</h5></div>{% endfor %}')
+
+
+def original_format_datetime(value, format='medium'):
+    date = dateutil.parser.parse(value)
+    if format == 'full':
+        format = "EEEE MMMM, d, y 'at' h:mma"
+    elif format == 'medium':
+        format = "EE MM, dd, y h:mma"
+    return babel.dates.format_datetime(date, format)
+
+
+def render(env, filter, shows, repeat):
+    env.filters['datetime'] = filter
+    template = env.from_string(ROW_TEMPLATE)
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        template.render(shows=shows)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    fyyur = common.load_app()
+    rng = random.Random(0)
+    now = datetime.now().replace(minute=0, second=0, microsecond=0)
+    starts = [now + timedelta(days=rng.randint(-365, 365), hours=rng.choice([19, 20, 21]))
+              for _ in range(args.rows)]
+    env = fyyur.app.jinja_env.overlay()
+
+    before = render(env, original_format_datetime,
+                    [{'start_time': start.isoformat(), 'artist_name': 'x'} for start in starts],
+                    args.repeat)
+    fyyur.format_datetime_cached.cache_clear()
+    after = render(env, fyyur.format_datetime,
+                   [{'start_time': start, 'artist_name': 'x'} for start in starts],
+                   args.repeat)
+
+    print('%d rows, best of %d' % (args.rows, args.repeat))
+    print('before %8.1f ms' % (before * 1000))
+    print('after  %8.1f ms  (%.1fx)' % (after * 1000, before / after))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""Runs EXPLAIN on every controller query and checks it uses an index.
+
+The statements are built by the same query functions the controllers call,
+with the parameters a real request would send. By default sequential scans
+are disabled for the session (``enable_seqscan = off``) so the check proves
+an index *can* serve each query even on a small development database, where
+the planner would rightly prefer a sequential scan; pass ``--planner-choice``
+to see the plans the planner picks on its own.
+
+    python benchmarks/explain_queries.py [--analyze] [--planner-choice]
+"""
+import argparse
+import sys
+from datetime import datetime
+
+import common
+
+
+def controller_queries(fyyur):
+    Venue, Artist, Show = fyyur.Venue, fyyur.Artist, fyyur.Show
+    current_time = datetime.now().strftime('%m/%d/%Y')
+    today = datetime.now().date()
+    venue_id = fyyur.db.session.query(fyyur.db.func.min(Venue.id)).scalar() or 1
+    artist_id = fyyur.db.session.query(fyyur.db.func.min(Artist.id)).scalar() or 1
+
+    show_order = [Show.start_time, Show.id]
+    first_show = fyyur.keyset_query(fyyur.show_listing_query(), show_order, per_page=1).first()
+    show_cursor = fyyur.encode_cursor(first_show, show_order) if first_show else None
+
+    return [
+        ('shows', fyyur.keyset_query(fyyur.show_listing_query(), show_order)),
+        ('shows (after cursor)', fyyur.keyset_query(fyyur.show_listing_query(), show_order,
+                                                    after=show_cursor)),
+        ('venues', fyyur.keyset_query(fyyur.venue_directory_query(current_time),
+                                      fyyur.VENUE_DIRECTORY_ORDER)),
+        ('artists', fyyur.keyset_query(fyyur.artist_listing_query(), [Artist.id])),
+        ('show_venue', Venue.query.filter(Venue.id == venue_id)),
+        ('show_venue history', _history(fyyur, Venue, venue_id, today)),
+        ('show_artist', Artist.query.filter(Artist.id == artist_id)),
+        ('show_artist history', _history(fyyur, Artist, artist_id, today)),
+        ('search_venues', fyyur.search_query(Venue, 'music')),
+        ('search_artists', fyyur.search_query(Artist, 'band')),
+    ]
+
+
+def _history(fyyur, owner, owner_id, today):
+    # load_show_history() executes its query itself; rebuild the same one
+    owner_key, counterpart, prefix = fyyur.SHOW_HISTORY_JOINS[owner.__name__]
+    Show = fyyur.Show
+    return fyyur.db.session.query(
+        counterpart.id, counterpart.name, counterpart.image_link, Show.start_time
+    ).select_from(Show).join(getattr(Show, prefix)).filter(
+        getattr(Show, owner_key) == owner_id).order_by(Show.start_time, Show.id)
+
+
+def explain(connection, query, analyze):
+    compiled = query.statement.compile(dialect=connection.dialect)
+    prefix = 'EXPLAIN (ANALYZE, BUFFERS) ' if analyze else 'EXPLAIN '
+    result = connection.exec_driver_sql(prefix + str(compiled), compiled.params)
+    return [row[0] for row in result]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    common.add_database_argument(parser)
+    parser.add_argument('--analyze', action='store_true', help='run EXPLAIN ANALYZE')
+    parser.add_argument('--planner-choice', action='store_true',
+                        help='leave enable_seqscan on')
+    args = parser.parse_args()
+
+    fyyur = common.load_app(args.database_url)
+    failures = []
+    with fyyur.app.app_context():
+        connection = fyyur.db.session.connection()
+        if not args.planner_choice:
+            connection.exec_driver_sql('SET enable_seqscan = off')
+        for name, query in controller_queries(fyyur):
+            plan = explain(connection, query, args.analyze)
+            print('== %s' % name)
+            print('\n'.join(plan))
+            print()
+            if any('Seq Scan' in line for line in plan):
+                failures.append(name)
+        fyyur.db.session.rollback()
+
+    if failures:
+        print('sequential scans in: %s' % ', '.join(failures))
+        return 1
+    print('every controller query is served by an index')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,92 @@
+"""Throughput of the bulk importer behind `flask import`.
+
+Writes synthetic venue, artist and show files (shows reference their venue
+and artist by natural key) to a temporary directory, loads them with COPY
+and with executemany, and reports records per second for each.
+
+    python benchmarks/import_throughput.py --venues 10000 --artists 10000 --shows 500000
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+import common
+from importer import Importer
+
+
+def write_files(directory, n_venues, n_artists, n_shows):
+    rng = random.Random(0)
+    venues, artists = [], []
+    with open(os.path.join(directory, 'venues.csv'), 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['name', 'city', 'state', 'address', 'genres'])
+        for i in range(n_venues):
+            city, state = rng.choice(common.CITIES)
+            venues.append((common._name(rng, 'venue', i), city, state))
+            writer.writerow([venues[-1][0], city, state, '%d Main St' % i,
+                             ';'.join(rng.sample(common.GENRES, 2))])
+    with open(os.path.join(directory, 'artists.ndjson'), 'w') as f:
+        for i in range(n_artists):
+            city, state = rng.choice(common.CITIES)
+            artists.append((common._name(rng, 'artist', i), city, state))
+            f.write(json.dumps({'name': artists[-1][0], 'city': city, 'state': state,
+                                'genres': rng.sample(common.GENRES, 2)}) + '\n')
+    today = date.today()
+    with open(os.path.join(directory, 'shows.csv'), 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['venue_name', 'venue_city', 'venue_state', 'artist_name', 'start_time'])
+        for _ in range(n_shows):
+            venue, artist = rng.choice(venues), rng.choice(artists)
+            writer.writerow([venue[0], venue[1], venue[2], artist[0],
+                             (today + timedelta(days=rng.randint(-365, 365))).isoformat()])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    common.add_database_argument(parser)
+    parser.add_argument('--venues', type=int, default=10000)
+    parser.add_argument('--artists', type=int, default=10000)
+    parser.add_argument('--shows', type=int, default=200000)
+    parser.add_argument('--batch-size', type=int, default=10000)
+    args = parser.parse_args()
+
+    fyyur = common.load_app(args.database_url)
+    directory = tempfile.mkdtemp(prefix='fyyur-import-')
+    models = {'venues': fyyur.Venue, 'artists': fyyur.Artist, 'shows': fyyur.Show}
+    try:
+        write_files(directory, args.venues, args.artists, args.shows)
+        with fyyur.app.app_context():
+            print('%-12s %-8s %10s %10s %12s' % ('method', 'kind', 'records', 'seconds', 'records/s'))
+            for use_copy in (True, False):
+                importer = Importer(fyyur.db, models, fyyur.ImportCheckpoint,
+                                    batch_size=args.batch_size, use_copy=use_copy,
+                                    log=lambda message: None)
+                try:
+                    for kind, name in (('venues', 'venues.csv'), ('artists', 'artists.ndjson'),
+                                       ('shows', 'shows.csv')):
+                        start = time.perf_counter()
+                        counts = importer.run(kind, os.path.join(directory, name), restart=True)
+                        elapsed = time.perf_counter() - start
+                        print('%-12s %-8s %10d %10.2f %12.0f' % (
+                            'COPY' if use_copy else 'executemany', kind,
+                            counts['inserted'], elapsed, counts['inserted'] / elapsed))
+                finally:
+                    common.cleanup(fyyur)
+            fyyur.ImportCheckpoint.query.filter(
+                fyyur.ImportCheckpoint.source.like('%' + directory + '%')).delete(
+                    synchronize_session=False)
+            fyyur.db.session.commit()
+    finally:
+        shutil.rmtree(directory)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,240 @@
+"""Finds where the app saturates: a load test swept over concurrency levels.
+
+Seeds synthetic venues, artists and shows, starts the app on a local port
+(gunicorn with gunicorn.conf.py by default, or Werkzeug's threaded server,
+or uvicorn with asgi.py), then for each --concurrency level runs that many
+clients for --duration seconds. Each client sends its next request as soon
+as the last one is answered, picking from a mix of the site's routes:
+
+    30%  listings      GET /venues, /artists, /shows
+    40%  detail pages  GET /venues/<id>, /artists/<id>
+    20%  search        POST /venues/search, /artists/search
+     5%  booking       POST /shows/create
+     5%  availability  GET /venues/available
+
+Reports throughput, error rate and latency percentiles per route and per
+level; with --output also as JSON. Throughput that stops growing while
+latency climbs marks the saturation point for that server configuration,
+so run it once per candidate setting of WEB_CONCURRENCY, WORKER_MODEL,
+WORKER_THREADS and DB_POOL_SIZE:
+
+    python benchmarks/load_sweep.py --workers 4 --concurrency 1 4 16 64
+    python benchmarks/load_sweep.py --worker-model threaded --threads 8 --pool-size 8
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+from urllib.parse import quote_plus, urlencode
+
+import common
+
+
+def venue_detail(context, rng):
+    return '/venues/%d' % rng.choice(context['venue_ids']), None
+
+
+def artist_detail(context, rng):
+    return '/artists/%d' % rng.choice(context['artist_ids']), None
+
+
+def search_term(context, rng):
+    return urlencode({'search_term': rng.choice(common.WORDS).lower()})
+
+
+def book_show(context, rng):
+    start = date.today() + timedelta(days=rng.randint(1, 365))
+    return '/shows/create', urlencode({'venue_id': rng.choice(context['venue_ids']),
+                                       'artist_id': rng.choice(context['artist_ids']),
+                                       'start_time': start.isoformat()})
+
+
+def availability(context, rng):
+    city, state = rng.choice(common.CITIES)
+    start = date.today() + timedelta(days=rng.randint(0, 300))
+    return '/venues/available?city=%s&state=%s&from=%s&to=%s' % (
+        quote_plus(city), state, start, start + timedelta(days=6)), None
+
+
+# route label: (weight, method, request(context, rng) -> (path, body))
+MIX = {
+    'GET /venues': (10, 'GET', lambda context, rng: ('/venues', None)),
+    'GET /artists': (10, 'GET', lambda context, rng: ('/artists', None)),
+    'GET /shows': (10, 'GET', lambda context, rng: ('/shows', None)),
+    'GET /venues/<id>': (20, 'GET', venue_detail),
+    'GET /artists/<id>': (20, 'GET', artist_detail),
+    'POST /venues/search': (10, 'POST', lambda context, rng: ('/venues/search', search_term(context, rng))),
+    'POST /artists/search': (10, 'POST', lambda context, rng: ('/artists/search', search_term(context, rng))),
+    'POST /shows/create': (5, 'POST', book_show),
+    'GET /venues/available': (5, 'GET', availability),
+}
+
+
+def server_command(server, port):
+    if server == 'gunicorn':
+        # settings from gunicorn.conf.py, which reads PORT
+        return [sys.executable, '-m', 'gunicorn', 'wsgi:app']
+    if server == 'werkzeug':
+        return [sys.executable, '-c', 'from werkzeug.serving import run_simple; from app import app; '
+                'run_simple("127.0.0.1", %d, app, threaded=True)' % port]
+    return [sys.executable, '-m', 'uvicorn', 'asgi:application', '--host', '127.0.0.1',
+            '--log-level', 'warning', '--port', str(port)]
+
+
+def server_environment(args):
+    env = dict(os.environ, PORT=str(args.port), FLASK_DEBUG='0',
+               SECRET_KEY=os.environ.get('SECRET_KEY', 'load-sweep'))
+    if args.database_url:
+        env['DATABASE_URL'] = args.database_url
+    for name, value in (('WORKER_MODEL', args.worker_model), ('WEB_CONCURRENCY', args.workers),
+                        ('WORKER_THREADS', args.threads), ('DB_POOL_SIZE', args.pool_size)):
+        if value is not None:
+            env[name] = str(value)
+    if args.no_page_cache:
+        env['PAGE_CACHE'] = ''
+    return env
+
+
+async def client(port, context, routes, weights, deadline, record, rng):
+    while time.perf_counter() < deadline:
+        route = rng.choices(routes, weights)[0]
+        _, method, build = MIX[route]
+        path, body = build(context, rng)
+        started = time.perf_counter()
+        try:
+            status = await asyncio.wait_for(common.http_request(port, method, path, body), 30)
+        except (OSError, asyncio.TimeoutError):
+            status = 0
+        record(route, status, time.perf_counter() - started)
+
+
+async def level(port, context, concurrency, duration, warmup, rng):
+    samples = defaultdict(lambda: {'latencies': [], 'errors': 0})
+    recording = [False]
+
+    def record(route, status, seconds):
+        if not recording[0]:
+            return
+        if status == 200:
+            samples[route]['latencies'].append(seconds)
+        else:
+            samples[route]['errors'] += 1
+
+    routes = list(MIX)
+    weights = [MIX[route][0] for route in routes]
+    started = time.perf_counter()
+    deadline = started + warmup + duration
+    clients = [client(port, context, routes, weights, deadline, record,
+                      random.Random(rng.random())) for _ in range(concurrency)]
+
+    async def start_recording():
+        await asyncio.sleep(warmup)
+        recording[0] = True
+
+    await asyncio.gather(start_recording(), *clients)
+    return samples
+
+
+def summarize(latencies, errors, duration):
+    total = len(latencies) + errors
+    return {
+        'requests': total,
+        'errors': errors,
+        'error_rate': errors / float(total) if total else 0.0,
+        'throughput': len(latencies) / duration,
+        'p50_ms': common.percentile(latencies, 0.5) * 1000,
+        'p95_ms': common.percentile(latencies, 0.95) * 1000,
+        'p99_ms': common.percentile(latencies, 0.99) * 1000,
+    }
+
+
+def print_row(label, row):
+    print('%-24s %8d %7.2f%% %9.1f %9.1f %9.1f %9.1f' % (
+        label, row['requests'], row['error_rate'] * 100, row['throughput'],
+        row['p50_ms'], row['p95_ms'], row['p99_ms']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    common.add_database_argument(parser)
+    parser.add_argument('--server', choices=['gunicorn', 'werkzeug', 'uvicorn'], default='gunicorn')
+    parser.add_argument('--worker-model', choices=['prefork', 'threaded'], help='gunicorn WORKER_MODEL')
+    parser.add_argument('--workers', type=int, help='gunicorn WEB_CONCURRENCY')
+    parser.add_argument('--threads', type=int, help='gunicorn WORKER_THREADS')
+    parser.add_argument('--pool-size', type=int, help='DB_POOL_SIZE of the server')
+    parser.add_argument('--no-page-cache', action='store_true', help='run the server with PAGE_CACHE off')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16, 64])
+    parser.add_argument('--duration', type=float, default=20, help='measured seconds per level')
+    parser.add_argument('--warmup', type=float, default=3, help='unmeasured seconds before each level')
+    parser.add_argument('--shows', type=int, default=100000)
+    parser.add_argument('--port', type=int, default=8932)
+    parser.add_argument('--rng-seed', type=int, default=0)
+    parser.add_argument('--output', help='write the results to this JSON file')
+    args = parser.parse_args()
+    n_venues = n_artists = max(args.shows // 100, 100)
+
+    fyyur = common.load_app(args.database_url)
+    rng = random.Random(args.rng_seed)
+    results = []
+    with fyyur.app.app_context():
+        try:
+            venue_ids, artist_ids = common.seed(fyyur, n_venues=n_venues, n_artists=n_artists, n_shows=0,
+                                                rng_seed=args.rng_seed)
+            common.generate_shows(fyyur, args.shows)
+            fyyur.db.session.execute('ANALYZE "Venue"; ANALYZE "Artist"; ANALYZE "Show"')
+            fyyur.db.session.commit()
+            context = {'venue_ids': venue_ids, 'artist_ids': artist_ids}
+            server = subprocess.Popen(server_command(args.server, args.port), cwd=common.ROOT,
+                                      env=server_environment(args),
+                                      stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                common.wait_for_port(args.port, timeout=60)
+                for concurrency in args.concurrency:
+                    samples = asyncio.run(level(args.port, context, concurrency, args.duration,
+                                                args.warmup, rng))
+                    routes = {route: summarize(sample['latencies'], sample['errors'], args.duration)
+                              for route, sample in sorted(samples.items())}
+                    total = summarize([seconds for sample in samples.values() for seconds in sample['latencies']],
+                                      sum(sample['errors'] for sample in samples.values()), args.duration)
+                    results.append({'concurrency': concurrency, 'total': total, 'routes': routes})
+                    print('\nconcurrency %d' % concurrency)
+                    print('%-24s %8s %8s %9s %9s %9s %9s' % (
+                        'route', 'requests', 'errors', 'req/s', 'p50 ms', 'p95 ms', 'p99 ms'))
+                    for route, row in routes.items():
+                        print_row(route, row)
+                    print_row('all', total)
+            finally:
+                server.terminate()
+                server.wait()
+        finally:
+            fyyur.db.session.rollback()
+            common.cleanup(fyyur)
+
+    print('\n%-24s %8s %8s %9s %9s %9s %9s' % (
+        'concurrency', 'requests', 'errors', 'req/s', 'p50 ms', 'p95 ms', 'p99 ms'))
+    for result in results:
+        print_row(str(result['concurrency']), result['total'])
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'server': args.server,
+                'worker_model': args.worker_model,
+                'workers': args.workers,
+                'threads': args.threads,
+                'pool_size': args.pool_size,
+                'page_cache': not args.no_page_cache,
+                'scale': {'venues': n_venues, 'artists': n_artists, 'shows': args.shows},
+                'duration': args.duration,
+                'levels': results,
+            }, f, indent=2, sort_keys=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
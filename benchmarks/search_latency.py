@@ -0,0 +1,69 @@
+"""Compares artist search latency before and after the trigram index.
+
+Seeds a large synthetic Artist table, then times each search term two ways:
+
+* before: the original unranked ``ilike('%term%')`` over the whole table
+  with the trigram index dropped (inside a transaction that is rolled back);
+* after: ``search_query`` (ranked, limited) with the GIN index in place.
+
+Requires the ``e4e4a576f6f8`` migration (pg_trgm) to have been applied.
+
+    python benchmarks/search_latency.py --artists 200000
+"""
+import argparse
+import statistics
+import sys
+import time
+
+import common
+
+TERMS = ['hop', 'velvet owls', 'thunder', 'sax band', 'crimson parade 12']
+
+
+def measure(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    common.add_database_argument(parser)
+    parser.add_argument('--artists', type=int, default=200000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    fyyur = common.load_app(args.database_url)
+    db, Artist = fyyur.db, fyyur.Artist
+    with fyyur.app.app_context():
+        common.seed(fyyur, n_venues=1, n_artists=args.artists, n_shows=0)
+        try:
+            db.session.execute('ANALYZE "Artist"')
+            db.session.commit()
+
+            after = {}
+            for term in TERMS:
+                after[term] = measure(lambda: fyyur.search_query(Artist, term).all(), args.repeat)
+
+            before = {}
+            db.session.execute('DROP INDEX "ix_Artist_name_trgm"')
+            for term in TERMS:
+                before[term] = measure(
+                    lambda: Artist.query.filter(Artist.name.ilike('%' + term + '%')).all(),
+                    args.repeat)
+            db.session.rollback()  # brings the index back
+        finally:
+            common.cleanup(fyyur)
+
+    print('%d artists, median of %d runs' % (args.artists, args.repeat))
+    print('%-20s %12s %12s' % ('term', 'before ms', 'after ms'))
+    for term in TERMS:
+        print('%-20s %12.2f %12.2f' % (term, before[term], after[term]))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
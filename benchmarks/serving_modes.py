@@ -0,0 +1,113 @@
+"""Load test of the threaded WSGI server against the async (ASGI) mode.
+
+Starts the app once under Werkzeug's threaded server (what `app.run()`
+uses) and once under uvicorn with asgi.py, then drives each with
+--clients concurrent clients fetching venue pages from /api/v1/venues/<id>
+for --duration seconds. Meanwhile --slow-clients connections trickle in
+request headers a byte per second and never finish, as slow or stalled
+clients do. Reports throughput, errors and latency percentiles per mode.
+
+    python benchmarks/serving_modes.py --clients 50 --slow-clients 500 --duration 20
+"""
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import time
+
+import common
+
+SERVERS = {
+    'wsgi': [sys.executable, '-c',
+             'import sys; from werkzeug.serving import run_simple; from app import app; '
+             'run_simple("127.0.0.1", int(sys.argv[1]), app, threaded=True)'],
+    'asgi': [sys.executable, '-m', 'uvicorn', 'asgi:application', '--host', '127.0.0.1',
+             '--log-level', 'warning', '--port'],
+}
+
+
+async def client(port, paths, deadline, latencies, errors):
+    rng = random.Random()
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            status = await asyncio.wait_for(common.http_request(port, 'GET', rng.choice(paths)), 30)
+        except (OSError, asyncio.TimeoutError):
+            status = 0
+        if status == 200:
+            latencies.append(time.perf_counter() - started)
+        else:
+            errors.append(status)
+
+
+async def slow_client(port, deadline):
+    try:
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    except OSError:
+        return
+    try:
+        writer.write(b'GET /venues HTTP/1.1\r\nHost: localhost\r\nX-Slow: ')
+        while time.perf_counter() < deadline:
+            await asyncio.sleep(1)
+            writer.write(b'x')
+            await writer.drain()
+    except OSError:
+        pass
+    finally:
+        writer.close()
+
+
+async def load(port, paths, clients, slow_clients, duration):
+    deadline = time.perf_counter() + duration
+    latencies, errors = [], []
+    tasks = [slow_client(port, deadline) for _ in range(slow_clients)]
+    tasks += [client(port, paths, deadline, latencies, errors) for _ in range(clients)]
+    await asyncio.gather(*tasks)
+    return latencies, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    common.add_database_argument(parser)
+    parser.add_argument('--modes', nargs='+', choices=sorted(SERVERS), default=['wsgi', 'asgi'])
+    parser.add_argument('--clients', type=int, default=50)
+    parser.add_argument('--slow-clients', type=int, default=500)
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--port', type=int, default=8931)
+    args = parser.parse_args()
+
+    fyyur = common.load_app(args.database_url)
+    env = dict(os.environ)
+    if args.database_url:
+        env['DATABASE_URL'] = args.database_url
+    with fyyur.app.app_context():
+        common.seed(fyyur, n_venues=1000, n_artists=1000, n_shows=20000)
+        try:
+            paths = ['/api/v1/venues/%d' % venue.id
+                     for venue in fyyur.db.session.query(fyyur.Venue.id).limit(1000)]
+            fyyur.db.session.rollback()
+            print('%-6s %8s %8s %9s %9s %9s %9s' % (
+                'mode', 'ok', 'errors', 'req/s', 'p50 ms', 'p95 ms', 'p99 ms'))
+            for mode in args.modes:
+                server = subprocess.Popen(SERVERS[mode] + [str(args.port)], cwd=common.ROOT, env=env,
+                                          stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                try:
+                    common.wait_for_port(args.port)
+                    latencies, errors = asyncio.run(load(
+                        args.port, paths, args.clients, args.slow_clients, args.duration))
+                finally:
+                    server.terminate()
+                    server.wait()
+                print('%-6s %8d %8d %9.1f %9.1f %9.1f %9.1f' % (
+                    mode, len(latencies), len(errors), len(latencies) / args.duration,
+                    common.percentile(latencies, 0.5) * 1000, common.percentile(latencies, 0.95) * 1000,
+                    common.percentile(latencies, 0.99) * 1000))
+        finally:
+            common.cleanup(fyyur)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,45 @@
+"""Checks that GET /shows issues a constant number of queries.
+
+Seeds an increasing number of shows, requests the listing through the Flask
+test client and reports the statements executed and the wall time for each
+size.  Exits non-zero if the query count grows with the row count.
+
+    python benchmarks/shows_query_count.py --sizes 100 1000 5000
+"""
+import argparse
+import sys
+
+import common
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    common.add_database_argument(parser)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 5000])
+    args = parser.parse_args()
+
+    fyyur = common.load_app(args.database_url)
+    client = fyyur.app.test_client()
+    counts = []
+    with fyyur.app.app_context():
+        print('%10s %10s %12s' % ('shows', 'queries', 'seconds'))
+        for size in args.sizes:
+            common.seed(fyyur, n_venues=max(size // 10, 1),
+                        n_artists=max(size // 10, 1), n_shows=size)
+            try:
+                with common.QueryCounter(fyyur.db.engine) as counter:
+                    response, elapsed = common.timed(client.get, '/shows')
+                assert response.status_code == 200, response.status_code
+            finally:
+                common.cleanup(fyyur)
+            counts.append(counter.count)
+            print('%10d %10d %12.4f' % (size, counter.count, elapsed))
+
+    if len(set(counts)) != 1:
+        print('query count grows with the number of shows')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""Times the "available venues in <city, state> between dates" search.
+
+Seeds --venues venues and --shows shows (the shows are generated inside
+Postgres, spread over a year either side of today), then answers the same
+searches two ways:
+
+* before: what the models alone allow -- load the city's venues and walk
+  each one's shows through the ``Venue.artists`` relationship, one query
+  per venue;
+* after: ``available_venues_query``, a single anti-join, both for the
+  whole answer and for the first page the /venues/available page shows.
+
+    python benchmarks/venue_availability.py --venues 100000 --shows 10000000
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+
+import common
+
+RANGES = [1, 7, 30]
+
+
+def before(fyyur, city, state, start, end):
+    venues = fyyur.Venue.query.filter_by(city=city, state=state).order_by(fyyur.Venue.id).all()
+    return [venue.id for venue in venues
+            if not any(start <= show.start_time <= end for show in venue.artists)]
+
+
+def after(fyyur, city, state, start, end):
+    return [venue.id for venue in fyyur.available_venues_query(city, state, start, end)]
+
+
+def first_page(fyyur, city, state, start, end):
+    rows, _, _ = fyyur.paginate(fyyur.available_venues_query(city, state, start, end),
+                                [fyyur.Venue.id])
+    return rows
+
+
+def measure(fyyur, fn, repeat, *args):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(fyyur, *args)
+        samples.append((time.perf_counter() - started) * 1000)
+        fyyur.db.session.rollback()
+    return result, statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    common.add_database_argument(parser)
+    parser.add_argument('--venues', type=int, default=100000)
+    parser.add_argument('--shows', type=int, default=10000000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--skip-before', action='store_true',
+                        help='only time the anti-join (the per-venue walk takes minutes at full size)')
+    args = parser.parse_args()
+
+    fyyur = common.load_app(args.database_url)
+    db = fyyur.db
+    rng = random.Random(0)
+    with fyyur.app.app_context():
+        try:
+            started = time.perf_counter()
+            common.seed(fyyur, n_venues=args.venues, n_artists=1000, n_shows=0)
+            common.generate_shows(fyyur, args.shows)
+            db.session.execute('ANALYZE "Venue"; ANALYZE "Show"')
+            db.session.commit()
+            print('seeded %d venues, %d shows in %.0f s' % (
+                args.venues, args.shows, time.perf_counter() - started))
+            print('%-22s %5s %9s %12s %12s %12s' % (
+                'city', 'days', 'free', 'before ms', 'after ms', 'page ms'))
+            for city, state in common.CITIES[:3]:
+                for days in RANGES:
+                    start = date.today() + timedelta(days=rng.randint(0, 300))
+                    end = start + timedelta(days=days - 1)
+                    free, after_ms = measure(fyyur, after, args.repeat, city, state, start, end)
+                    _, page_ms = measure(fyyur, first_page, args.repeat, city, state, start, end)
+                    before_ms = float('nan')
+                    if not args.skip_before:
+                        expected, before_ms = measure(fyyur, before, 1, city, state, start, end)
+                        assert expected == free, 'anti-join disagrees with the per-venue walk'
+                    print('%-22s %5d %9d %12.1f %12.1f %12.1f' % (
+                        '%s, %s' % (city, state), days, len(free), before_ms, after_ms, page_ms))
+        finally:
+            db.session.rollback()
+            common.cleanup(fyyur)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
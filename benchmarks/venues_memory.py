@@ -0,0 +1,44 @@
+"""Checks that GET /venues uses flat memory as the Show table grows.
+
+Keeps the number of venues fixed, seeds an increasing number of shows and
+reports the peak Python allocation (tracemalloc) and query count of one
+request to the venue directory.
+
+    python benchmarks/venues_memory.py --venues 500 --sizes 1000 10000 100000
+"""
+import argparse
+import sys
+import tracemalloc
+
+import common
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    common.add_database_argument(parser)
+    parser.add_argument('--venues', type=int, default=500)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    args = parser.parse_args()
+
+    fyyur = common.load_app(args.database_url)
+    client = fyyur.app.test_client()
+    with fyyur.app.app_context():
+        print('%10s %10s %14s' % ('shows', 'queries', 'peak KiB'))
+        for size in args.sizes:
+            common.seed(fyyur, n_venues=args.venues, n_artists=args.venues, n_shows=size)
+            try:
+                client.get('/venues')  # warm up template and statement caches
+                tracemalloc.start()
+                with common.QueryCounter(fyyur.db.engine) as counter:
+                    response = client.get('/venues')
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                assert response.status_code == 200, response.status_code
+            finally:
+                common.cleanup(fyyur)
+            print('%10d %10d %14.1f' % (size, counter.count, peak / 1024.0))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,263 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Rendered-page cache. Entries are stored under a key (the request path) with
+# a set of tags naming the rows the page displays; writes evict by tag, so
+# only the pages that show a changed row are dropped.
+#
+# An entry may also carry an `expires` unix time for pages whose content
+# changes with the clock alone; it is dropped on the first get after that.
+#
+# A backend implements get/set/delete_tags/clear/generation/__len__ plus
+# `evictions` and `expirations` counters. `generation` must change on every
+# delete_tags so a page rendered before an invalidation is not stored after it.
+
+
+class LRUBackend(object):
+    """Per-process backend holding at most `max_entries` pages."""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.evictions = 0
+        self.expirations = 0
+        self._entries = OrderedDict()
+        self._tags = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def generation(self):
+        return self._generation
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[2] is not None and entry[2] <= time.time():
+                self._discard(key)
+                self.expirations += 1
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, value, tags, generation=None, expires=None):
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return False
+            self._discard(key)
+            self._entries[key] = (value, frozenset(tags), expires)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._discard(next(iter(self._entries)))
+                self.evictions += 1
+            return True
+
+    def delete_tags(self, tags):
+        with self._lock:
+            self._generation += 1
+            keys = set()
+            for tag in tags:
+                keys.update(self._tags.get(tag, ()))
+            for key in keys:
+                self._discard(key)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._tags.clear()
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[1]:
+            keys = self._tags[tag]
+            keys.discard(key)
+            if not keys:
+                del self._tags[tag]
+
+
+class SQLiteBackend(object):
+    """Backend shared by every worker process on a host.
+
+    A local stand-in for a networked store such as Redis or memcached: pages
+    live in one SQLite file (WAL mode), so an invalidation made by one worker
+    is seen by all of them. Least recently used entries beyond `max_entries`
+    are evicted.
+    """
+
+    def __init__(self, path, max_entries=10000):
+        self.path = path
+        self.max_entries = max_entries
+        self.evictions = 0
+        self.expirations = 0
+        self._local = threading.local()
+        # a SQLite connection must not be used on both sides of a fork
+        os.register_at_fork(after_in_child=self._forget_connections)
+        with self._connect() as connection:
+            connection.executescript('''
+                PRAGMA journal_mode = WAL;
+                CREATE TABLE IF NOT EXISTS page (key TEXT PRIMARY KEY, value BLOB, used REAL, expires REAL);
+                CREATE INDEX IF NOT EXISTS page_used ON page (used);
+                CREATE TABLE IF NOT EXISTS page_tag (tag TEXT, key TEXT, PRIMARY KEY (tag, key));
+                CREATE INDEX IF NOT EXISTS page_tag_key ON page_tag (key);
+                CREATE TABLE IF NOT EXISTS generation (id INTEGER PRIMARY KEY CHECK (id = 0), value INTEGER);
+                INSERT OR IGNORE INTO generation VALUES (0, 0);
+            ''')
+
+    def _connect(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA synchronous = NORMAL')
+            self._local.connection = connection
+        return connection
+
+    def _forget_connections(self):
+        self._local = threading.local()
+
+    def __len__(self):
+        return self._connect().execute('SELECT count(*) FROM page').fetchone()[0]
+
+    def generation(self):
+        return self._connect().execute('SELECT value FROM generation').fetchone()[0]
+
+    def get(self, key):
+        connection = self._connect()
+        row = connection.execute('SELECT value, expires FROM page WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        if row[1] is not None and row[1] <= now:
+            connection.execute('BEGIN IMMEDIATE')
+            self._delete_keys(connection, [key])
+            connection.execute('COMMIT')
+            self.expirations += 1
+            return None
+        connection.execute('UPDATE page SET used = ? WHERE key = ?', (now, key))
+        return bytes(row[0])
+
+    def set(self, key, value, tags, generation=None, expires=None):
+        connection = self._connect()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            if generation is not None and generation != self.generation():
+                connection.execute('ROLLBACK')
+                return False
+            connection.execute('DELETE FROM page_tag WHERE key = ?', (key,))
+            connection.execute('INSERT OR REPLACE INTO page VALUES (?, ?, ?, ?)',
+                               (key, sqlite3.Binary(value), time.time(), expires))
+            connection.executemany('INSERT INTO page_tag VALUES (?, ?)',
+                                   [(tag, key) for tag in tags])
+            excess = connection.execute('SELECT count(*) FROM page').fetchone()[0] - self.max_entries
+            if excess > 0:
+                stale = [row[0] for row in connection.execute(
+                    'SELECT key FROM page ORDER BY used LIMIT ?', (excess,))]
+                self._delete_keys(connection, stale)
+                self.evictions += len(stale)
+            connection.execute('COMMIT')
+            return True
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+
+    def delete_tags(self, tags):
+        connection = self._connect()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.execute('UPDATE generation SET value = value + 1')
+            keys = set()
+            for tag in tags:
+                keys.update(row[0] for row in connection.execute(
+                    'SELECT key FROM page_tag WHERE tag = ?', (tag,)))
+            self._delete_keys(connection, keys)
+            connection.execute('COMMIT')
+            return len(keys)
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+
+    def clear(self):
+        connection = self._connect()
+        connection.executescript('''
+            BEGIN IMMEDIATE;
+            UPDATE generation SET value = value + 1;
+            DELETE FROM page;
+            DELETE FROM page_tag;
+            COMMIT;
+        ''')
+
+    def _delete_keys(self, connection, keys):
+        keys = [(key,) for key in keys]
+        connection.executemany('DELETE FROM page WHERE key = ?', keys)
+        connection.executemany('DELETE FROM page_tag WHERE key = ?', keys)
+
+
+class PageCache(object):
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+
+    def generation(self):
+        return self.backend.generation()
+
+    def get(self, key):
+        value = self.backend.get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key, value, tags, generation=None, expires=None):
+        """Store `value` until `expires` (unix time) if given; skipped if
+        anything was invalidated since `generation` was read, as the page
+        may predate that write."""
+        return self.backend.set(key, value, tags, generation, expires)
+
+    def invalidate(self, *tags):
+        evicted = self.backend.delete_tags(tags)
+        with self._lock:
+            self.invalidations += evicted
+        return evicted
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.backend),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": float(self.hits) / lookups if lookups else 0.0,
+            "evictions": self.backend.evictions,
+            "expirations": self.backend.expirations,
+            "invalidations": self.invalidations,
+        }
+
+
+def from_config(config):
+    """PageCache for the PAGE_CACHE* settings, or None when disabled."""
+    backend = config.get('PAGE_CACHE')
+    if not backend:
+        return None
+    if backend == 'lru':
+        return PageCache(LRUBackend(config.get('PAGE_CACHE_SIZE', 1024)))
+    if backend == 'sqlite':
+        return PageCache(SQLiteBackend(config['PAGE_CACHE_PATH'], config.get('PAGE_CACHE_SIZE', 1024)))
+    raise ValueError('unknown PAGE_CACHE backend %r' % backend)
@@ -0,0 +1,65 @@
+import csv
+import io
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # parquet export is optional
+    pyarrow = None
+
+# Writers behind `flask export-shows` and /api/v1/shows/export.csv. Both take
+# `chunks`, an iterable of row lists produced a fixed number of rows at a
+# time, and emit one piece of output per chunk, so memory is bounded by the
+# chunk size rather than by the table.
+
+SHOW_COLUMNS = ('show_id', 'start_time', 'venue_id', 'venue_name', 'venue_city',
+                'venue_state', 'artist_id', 'artist_name')
+
+FORMATS = ('csv', 'parquet')
+
+
+def csv_chunks(columns, chunks):
+    """Yield the header line, then one CSV string per chunk."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.getvalue()
+    for chunk in chunks:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(chunk)
+        yield buffer.getvalue()
+
+
+def write_csv(columns, chunks, f):
+    writer = csv.writer(f)
+    writer.writerow(columns)
+    rows = 0
+    for chunk in chunks:
+        writer.writerows(chunk)
+        rows += len(chunk)
+    return rows
+
+
+def write_parquet(columns, chunks, path):
+    """Write each chunk as one row group of a Parquet file; needs pyarrow."""
+    if pyarrow is None:
+        raise RuntimeError('parquet export needs pyarrow')
+    schema = pyarrow.schema([
+        ('show_id', pyarrow.int64()),
+        ('start_time', pyarrow.date32()),
+        ('venue_id', pyarrow.int64()),
+        ('venue_name', pyarrow.string()),
+        ('venue_city', pyarrow.string()),
+        ('venue_state', pyarrow.string()),
+        ('artist_id', pyarrow.int64()),
+        ('artist_name', pyarrow.string()),
+    ])
+    rows = 0
+    with pyarrow.parquet.ParquetWriter(path, schema) as writer:
+        for chunk in chunks:
+            arrays = [pyarrow.array([row[i] for row in chunk], type=schema.field(name).type)
+                      for i, name in enumerate(columns)]
+            writer.write_table(pyarrow.Table.from_arrays(arrays, schema=schema))
+            rows += len(chunk)
+    return rows
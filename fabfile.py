@@ -5,9 +5,12 @@ from fabric.contrib.console import confirm
 
 
 def test():
+    # the tests in tests/, then every controller against a small synthetic
+    # data set; fails on an unexpected status (see benchmarks/controllers.py)
     with settings(warn_only=True):
         result = local(
-            "python test_tasks.py -v && python test_users.py -v", capture=True
+            "python -m pytest -q tests && python benchmarks/controllers.py --shows 1000 --repeat 3",
+            capture=True
         )
     if result.failed and not confirm("Tests failed. Continue?"):
         abort("Aborted at user request.")
@@ -39,9 +42,7 @@ def heroku():
 
 
 def heroku_test():
-    local(
-        "heroku run python test_tasks.py -v && heroku run python test_users.py -v"
-    )
+    local("heroku run python benchmarks/controllers.py --shows 1000 --repeat 3")
 
 
 def deploy():
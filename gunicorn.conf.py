@@ -0,0 +1,66 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+# gunicorn settings for wsgi.py, read from the environment:
+#
+#   WORKER_MODEL     'prefork': sync workers, one request per process at a
+#                    time; 'threaded': gthread workers, WORKER_THREADS each
+#   WEB_CONCURRENCY  worker processes (default: 2 * cores + 1 for prefork,
+#                    cores for threaded)
+#   WORKER_THREADS   threads per threaded worker (default 8)
+#   PORT             port to listen on (default 8000)
+#   PROMETHEUS_MULTIPROC_DIR
+#                    where the workers write their /metrics values (default:
+#                    a new temporary directory, removed on shutdown); must be
+#                    empty when gunicorn starts
+#
+# Each process has its own connection pool, so
+# WEB_CONCURRENCY * (DB_POOL_SIZE + DB_MAX_OVERFLOW) must stay below the
+# Postgres max_connections (see config.py). A threaded worker needs
+# DB_POOL_SIZE of at least WORKER_THREADS to avoid waiting on checkouts.
+
+worker_model = os.environ.get('WORKER_MODEL', 'prefork')
+if worker_model not in ('prefork', 'threaded'):
+    raise RuntimeError('WORKER_MODEL must be prefork or threaded, not %r' % worker_model)
+cores = multiprocessing.cpu_count()
+
+bind = '0.0.0.0:%s' % os.environ.get('PORT', '8000')
+worker_class = 'sync' if worker_model == 'prefork' else 'gthread'
+workers = int(os.environ.get('WEB_CONCURRENCY', 2 * cores + 1 if worker_model == 'prefork' else cores))
+threads = int(os.environ.get('WORKER_THREADS', 8)) if worker_model == 'threaded' else 1
+# import and warm the app once in the master, then fork
+preload_app = True
+accesslog = '-'
+
+# set before the app, and with it prometheus_client, is imported
+if 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+    os.environ['PROMETHEUS_MULTIPROC_DIR'] = metrics_dir = tempfile.mkdtemp(prefix='fyyur-metrics-')
+else:
+    metrics_dir = None
+
+
+def on_starting(server):
+    # the app is preloaded by now
+    from wsgi import per_process_caches
+    caches = per_process_caches()
+    if server.num_workers > 1 and caches:
+        raise RuntimeError('%s: each of the %d workers would keep its own copy, left stale by writes to the '
+                           'others; turn these off or set WEB_CONCURRENCY=1' % (', '.join(caches), server.num_workers))
+
+
+def post_fork(server, worker):
+    from wsgi import after_fork
+    after_fork(server.cfg.threads)
+
+
+def child_exit(server, worker):
+    # drop the exited worker's in-flight gauges from the totals
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def on_exit(server):
+    if metrics_dir:
+        shutil.rmtree(metrics_dir, ignore_errors=True)
@@ -0,0 +1,299 @@
+import csv
+import hashlib
+import io
+import json
+import os
+from collections import defaultdict
+from datetime import date, datetime
+
+import dateutil.parser
+
+# Bulk loader behind `flask import`. Records are read from CSV or NDJSON
+# files, validated in Python and written in batches, with COPY on
+# PostgreSQL/psycopg2 and executemany elsewhere. Each batch commits together
+# with a checkpoint row holding the number of records consumed, so an
+# interrupted import resumes after the last committed batch. The checkpoint
+# belongs to one version of the file, told apart by its size and the digest
+# of its start: a new file dropped at the same path starts from its first
+# record. Records that cannot be loaded are written to a rejects CSV with the
+# reason, started afresh whenever an import starts from the first record.
+#
+# Shows name their venue and artist either by id (venue_id, artist_id) or by
+# natural key: venue_name / artist_name, optionally narrowed by
+# venue_city, venue_state / artist_city, artist_state.
+
+FIELDS = {
+    'venues': ('name', 'city', 'state', 'address', 'phone', 'genres', 'image_link',
+               'facebook_link', 'website', 'seeking_talent', 'seeking_description'),
+    'artists': ('name', 'city', 'state', 'phone', 'genres', 'image_link',
+                'facebook_link', 'website', 'seeking_venue', 'seeking_description'),
+    'shows': ('venue_id', 'artist_id', 'start_time'),
+}
+
+GENRE_SEPARATOR = ';'
+
+# bytes hashed at the start of a file to tell its versions apart
+VERSION_BYTES = 1 << 20
+
+
+class Rejected(ValueError):
+    pass
+
+
+def read_records(path):
+    """Yield (number, record) for each record of a .csv or .ndjson/.jsonl
+    file; record is a Rejected error for lines that do not parse."""
+    if path.endswith('.csv'):
+        with open(path, newline='') as f:
+            for number, record in enumerate(csv.DictReader(f), 1):
+                yield number, record
+        return
+    with open(path) as f:
+        number = 0
+        for line in f:
+            if not line.strip():
+                continue
+            number += 1
+            try:
+                record = json.loads(line)
+                if not isinstance(record, dict):
+                    raise ValueError('not an object')
+            except ValueError as e:
+                record = Rejected('invalid JSON: %s' % e)
+            yield number, record
+
+
+def file_version(path):
+    """Size and digest of the first VERSION_BYTES of `path`."""
+    with open(path, 'rb') as f:
+        digest = hashlib.sha1(f.read(VERSION_BYTES)).hexdigest()[:16]
+    return '%d:%s' % (os.path.getsize(path), digest)
+
+
+def _text(record, field, column):
+    value = record.get(field)
+    if value is None or value == '':
+        return None
+    if isinstance(value, (list, dict)):
+        raise Rejected('%s must be a string' % field)
+    value = str(value).strip()
+    length = getattr(column.type, 'length', None)
+    if length and len(value) > length:
+        raise Rejected('%s longer than %d characters' % (field, length))
+    return value
+
+
+def _genres(record):
+    value = record.get('genres')
+    if value is None or value == '':
+        return None
+    if isinstance(value, str):
+        value = value.split(GENRE_SEPARATOR)
+    if not isinstance(value, list):
+        raise Rejected('genres must be a list')
+    return [str(genre).strip() for genre in value if str(genre).strip()]
+
+
+def _date(value):
+    # ISO dates and timestamps are the common case; anything else goes
+    # through the (much slower) dateutil parser
+    try:
+        return date.fromisoformat(value[:10]) if len(value) == 10 else \
+            datetime.fromisoformat(value).date()
+    except ValueError:
+        pass
+    try:
+        return dateutil.parser.parse(value).date()
+    except (ValueError, OverflowError):
+        raise Rejected('start_time %r is not a date' % value)
+
+
+def _pg_array(values):
+    if values is None:
+        return None
+    return '{%s}' % ','.join(
+        '"%s"' % value.replace('\\', '\\\\').replace('"', '\\"') for value in values)
+
+
+class Importer(object):
+
+    def __init__(self, db, models, checkpoint_model, batch_size=10000, use_copy=None,
+                 log=print):
+        # models: {'venues': Venue, 'artists': Artist, 'shows': Show}
+        self.db = db
+        self.models = models
+        self.checkpoint_model = checkpoint_model
+        self.batch_size = batch_size
+        self.use_copy = use_copy
+        self.log = log
+
+    def run(self, kind, path, rejects_path=None, restart=False):
+        """Load `path` into `kind`; returns counts of inserted, rejected and
+        skipped (already imported) records."""
+        session = self.db.session
+        if self.use_copy is None:
+            self.use_copy = self.db.engine.dialect.driver == 'psycopg2'
+        model = self.checkpoint_model
+        name = '%s:%s' % (kind, os.path.abspath(path))
+        source = '%s@%s' % (name, file_version(path))
+        # checkpoints of earlier versions of the file, now replaced
+        replaced = session.query(model).filter(
+            (model.source == name) | model.source.startswith(name + '@', autoescape=True),
+            model.source != source).delete(synchronize_session=False)
+        if replaced:
+            self.log('%s has changed since it was last imported; starting from its first record' % path)
+        checkpoint = session.get(model, source)
+        if checkpoint is None:
+            checkpoint = model(source=source, records=0)
+            session.add(checkpoint)
+        elif restart:
+            checkpoint.records = 0
+        done = checkpoint.records
+        rejects_path = rejects_path or path + '.rejects.csv'
+        if not done and os.path.exists(rejects_path):
+            os.remove(rejects_path)
+        counts = {'inserted': 0, 'rejected': 0, 'skipped': done}
+
+        batch, rejects = [], []
+        for number, record in read_records(path):
+            if number <= done:
+                continue
+            batch.append((number, record))
+            if len(batch) >= self.batch_size:
+                self._flush(kind, batch, rejects, checkpoint, counts)
+                self._write_rejects(rejects_path, rejects)
+                batch, rejects = [], []
+        self._flush(kind, batch, rejects, checkpoint, counts)
+        self._write_rejects(rejects_path, rejects)
+        return counts
+
+    def _flush(self, kind, batch, rejects, checkpoint, counts):
+        session = self.db.session
+        rows = []
+        clean = getattr(self, '_clean_' + kind)
+        prepared = self._prepare_shows(batch) if kind == 'shows' else None
+        for number, record in batch:
+            try:
+                if isinstance(record, Rejected):
+                    raise record
+                rows.append(clean(record, prepared))
+            except Rejected as e:
+                rejects.append((number, str(e), record))
+        if rows:
+            self._insert(self.models[kind].__table__, FIELDS[kind], rows)
+        if batch:
+            checkpoint.records = batch[-1][0]
+        session.commit()
+        counts['inserted'] += len(rows)
+        counts['rejected'] += len(batch) - len(rows)
+        self.log('%s: %d inserted, %d rejected' % (kind, counts['inserted'], counts['rejected']))
+
+    def _insert(self, table, fields, rows):
+        if not self.use_copy:
+            self.db.session.execute(table.insert(), [dict(zip(fields, row)) for row in rows])
+            return
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow([_pg_array(value) if isinstance(value, list) else value
+                             for value in row])
+        buffer.seek(0)
+        cursor = self.db.session.connection().connection.cursor()
+        cursor.copy_expert('COPY "%s" (%s) FROM STDIN WITH (FORMAT csv)' % (
+            table.name, ', '.join(fields)), buffer)
+
+    def _write_rejects(self, path, rejects):
+        if not rejects:
+            return
+        new = not os.path.exists(path)
+        with open(path, 'a', newline='') as f:
+            writer = csv.writer(f)
+            if new:
+                writer.writerow(['record', 'reason', 'data'])
+            for number, reason, record in rejects:
+                data = '' if isinstance(record, Rejected) else json.dumps(record)
+                writer.writerow([number, reason, data])
+
+    def _clean_performer(self, kind, record):
+        columns = self.models[kind].__table__.c
+        row = []
+        for field in FIELDS[kind]:
+            row.append(_genres(record) if field == 'genres' else _text(record, field, columns[field]))
+        if not row[0]:
+            raise Rejected('name is required')
+        return tuple(row)
+
+    def _clean_venues(self, record, prepared):
+        return self._clean_performer('venues', record)
+
+    def _clean_artists(self, record, prepared):
+        return self._clean_performer('artists', record)
+
+    # Shows
+
+    def _prepare_shows(self, batch):
+        # One query per referenced table per batch: ids named directly are
+        # checked for existence, names are looked up with city and state.
+        prepared = {}
+        for kind, prefix in (('venues', 'venue'), ('artists', 'artist')):
+            model = self.models[kind]
+            ids, names = set(), set()
+            for _, record in batch:
+                if isinstance(record, Rejected):
+                    continue
+                value = record.get(prefix + '_id')
+                if value not in (None, ''):
+                    try:
+                        ids.add(int(value))
+                    except (TypeError, ValueError):
+                        pass
+                elif record.get(prefix + '_name'):
+                    names.add(str(record[prefix + '_name']).strip())
+            existing = set()
+            by_name = defaultdict(list)
+            if ids or names:
+                query = self.db.session.query(model.id, model.name, model.city, model.state)
+                condition = model.id.in_(ids) if ids else None
+                if names:
+                    condition = model.name.in_(names) if condition is None else \
+                        condition | model.name.in_(names)
+                for row in query.filter(condition):
+                    if row.id in ids:
+                        existing.add(row.id)
+                    by_name[row.name].append(row)
+            prepared[prefix] = (existing, by_name)
+        return prepared
+
+    def _resolve(self, record, prefix, prepared):
+        existing, by_name = prepared[prefix]
+        value = record.get(prefix + '_id')
+        if value not in (None, ''):
+            try:
+                id = int(value)
+            except (TypeError, ValueError):
+                raise Rejected('%s_id is not an integer' % prefix)
+            if id not in existing:
+                raise Rejected('unknown %s id %d' % (prefix, id))
+            return id
+        name = str(record.get(prefix + '_name') or '').strip()
+        if not name:
+            raise Rejected('%s_id or %s_name is required' % (prefix, prefix))
+        matches = by_name.get(name, [])
+        for field in ('city', 'state'):
+            wanted = record.get('%s_%s' % (prefix, field))
+            if wanted:
+                matches = [row for row in matches if getattr(row, field) == wanted]
+        if not matches:
+            raise Rejected('unknown %s %r' % (prefix, name))
+        if len(matches) > 1:
+            raise Rejected('ambiguous %s %r: add %s_city/%s_state' % (prefix, name, prefix, prefix))
+        return matches[0].id
+
+    def _clean_shows(self, record, prepared):
+        value = record.get('start_time')
+        if not value:
+            raise Rejected('start_time is required')
+        start_time = _date(str(value))
+        return (self._resolve(record, 'venue', prepared),
+                self._resolve(record, 'artist', prepared),
+                start_time)
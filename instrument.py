@@ -0,0 +1,144 @@
+import logging
+import re
+import time
+from collections import Counter
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Per-request SQL instrumentation. Engine events time every statement sent
+# through any engine (the primary, the replicas and the async server's), and
+# inside a request the figures add up on flask.g: the statement count, the
+# total database time and how often each statement fingerprint ran. After
+# the request a fingerprint seen more than SQL_REPEAT_LIMIT times is
+# reported as a likely N+1: logged as a warning, or raised as
+# RepeatedQueryError when SQL_REPEAT_FAIL is on or the app is testing.
+# Statements slower than SQL_SLOW_MS go to the slow-query log (SQL_SLOW_LOG)
+# with their EXPLAIN plan. Statements run while a streamed body is sent,
+# after the response has been returned, are timed but not checked.
+
+PLACEHOLDER = re.compile(r"%\([^)]*\)s|%s|\$\d+|'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+LIST = re.compile(r'\(\?(?:, \?)+\)')
+
+
+class RepeatedQueryError(Exception):
+    pass
+
+
+def fingerprint(statement):
+    # the statement with its parameters and literals replaced by ?, and
+    # expanded IN lists of any length collapsed to one form
+    statement = PLACEHOLDER.sub('?', ' '.join(statement.split()))
+    return LIST.sub('(?...)', statement)
+
+
+class RequestQueries(object):
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.fingerprints = Counter()
+
+    def add(self, statement, seconds):
+        self.count += 1
+        self.seconds += seconds
+        self.fingerprints[fingerprint(statement)] += 1
+
+
+class SQLInstrumentation(object):
+
+    def __init__(self, app=None):
+        self.app = None
+        self.slow_log = logging.getLogger('fyyur.sql.slow')
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if not app.config['SQL_INSTRUMENTATION']:
+            return
+        self.app = app
+        if app.config['SQL_SLOW_LOG'] and not self.slow_log.handlers:
+            handler = logging.FileHandler(app.config['SQL_SLOW_LOG'])
+            handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+            self.slow_log.addHandler(handler)
+            self.slow_log.setLevel(logging.INFO)
+            self.slow_log.propagate = False
+        event.listen(Engine, 'before_cursor_execute', self.before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', self.after_cursor_execute)
+        event.listen(Engine, 'handle_error', self.handle_error)
+        app.before_request(self.start_request)
+        app.after_request(self.check_request)
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        seconds = time.perf_counter() - conn.info['query_started'].pop()
+        if has_request_context():
+            g.setdefault('sql_queries', RequestQueries()).add(statement, seconds)
+        if seconds * 1000 >= self.app.config['SQL_SLOW_MS']:
+            self.log_slow(conn, statement, parameters, executemany, seconds)
+
+    def handle_error(self, context):
+        # a failed statement never reaches after_cursor_execute: drop its
+        # start time so it does not pile up on the pooled connection
+        if context.connection is not None and context.statement is not None:
+            started = context.connection.info.get('query_started')
+            if started:
+                started.pop()
+
+    def log_slow(self, conn, statement, parameters, executemany, seconds):
+        where = '%s %s' % (request.method, request.path) if has_request_context() else 'outside a request'
+        plan = None
+        # reads only: a slow write is usually waiting on locks or triggers,
+        # which a plan does not show
+        if self.app.config['SQL_EXPLAIN'] and not executemany and \
+                statement.lstrip()[:6].upper().startswith(('SELECT', 'WITH')):
+            plan = self.explain(conn, statement, parameters)
+        if executemany:
+            parameters = '%d parameter sets' % len(parameters)
+        self.slow_log.info('%.1f ms (%s)\n%s\nparameters: %s\n%s', seconds * 1000, where,
+                           statement, parameters, plan or '(no plan)')
+
+    def explain(self, conn, statement, parameters):
+        # Run on the raw DBAPI connection, so it fires no events of its own,
+        # inside a savepoint, so a failed EXPLAIN leaves the request's
+        # transaction usable.
+        cursor = conn.connection.cursor()
+        try:
+            cursor.execute('SAVEPOINT sql_explain')
+            try:
+                cursor.execute('EXPLAIN ' + statement, parameters)
+                plan = '\n'.join(row[0] for row in cursor.fetchall())
+            except Exception as error:
+                cursor.execute('ROLLBACK TO SAVEPOINT sql_explain')
+                plan = '(EXPLAIN failed: %s)' % error
+            cursor.execute('RELEASE SAVEPOINT sql_explain')
+            return plan
+        except Exception:
+            return None
+        finally:
+            cursor.close()
+
+    def start_request(self):
+        # g outlives the request when the app context was pushed around it
+        # (tests, scripts), so every request starts its own count
+        g.sql_queries = RequestQueries()
+
+    def check_request(self, response):
+        queries = g.pop('sql_queries', None)
+        if queries is None or not queries.count:
+            return response
+        response.headers.add('Server-Timing', 'db;dur=%.1f;desc="%d statements"' % (
+            queries.seconds * 1000, queries.count))
+        self.app.logger.debug('%s %s: %d statements, %.1f ms', request.method, request.path,
+                              queries.count, queries.seconds * 1000)
+        statement, times = queries.fingerprints.most_common(1)[0]
+        if times > self.app.config['SQL_REPEAT_LIMIT']:
+            message = '%s %s ran the same statement %d times (N+1?): %s' % (
+                request.method, request.path, times, statement)
+            if self.app.config['SQL_REPEAT_FAIL'] or self.app.testing:
+                raise RepeatedQueryError(message)
+            self.app.logger.warning(message)
+        return response
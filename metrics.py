@@ -0,0 +1,122 @@
+import os
+import time
+
+from flask import Response, before_render_template, g, got_request_exception, request, template_rendered
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, \
+    generate_latest, multiprocess
+from sqlalchemy import event, exc
+from sqlalchemy.pool import Pool
+
+from pool import CheckoutMetrics
+
+# Prometheus metrics, served at /metrics: request latency, responses and
+# in-flight requests per endpoint, unhandled exceptions, template render
+# time, page cache lookups and database pool checkouts.
+#
+# Updating a metric is a few dictionary lookups and an add to a float, cheap
+# enough to leave on. With PROMETHEUS_MULTIPROC_DIR set (gunicorn.conf.py
+# sets it) every process writes its values to its own memory-mapped file in
+# that directory, and a scrape, whichever worker answers it, adds up the
+# files of all of them. The directory must start empty; gunicorn.conf.py
+# creates a fresh one per run unless it was given. Template render time
+# comes from Flask's signals, which need blinker.
+
+REQUEST_SECONDS = Histogram(
+    'fyyur_http_request_duration_seconds', 'Time to handle a request, including a streamed body.',
+    ['endpoint', 'method'])
+RESPONSES = Counter(
+    'fyyur_http_responses', 'Responses sent, by status code.', ['endpoint', 'method', 'status'])
+IN_PROGRESS = Gauge(
+    'fyyur_http_requests_in_progress', 'Requests being handled.', ['endpoint'], multiprocess_mode='livesum')
+EXCEPTIONS = Counter(
+    'fyyur_http_exceptions', 'Unhandled exceptions, answered with a 500.', ['endpoint', 'exception'])
+TEMPLATE_SECONDS = Histogram(
+    'fyyur_template_render_seconds', 'Time to render a template.', ['template'])
+PAGE_CACHE_LOOKUPS = Counter(
+    'fyyur_page_cache_lookups', 'Page cache lookups, by result (hit or miss).', ['result'])
+POOL_WAIT_SECONDS = Histogram(
+    'fyyur_db_pool_checkout_wait_seconds', 'Time waited for a database connection.',
+    buckets=CheckoutMetrics.BUCKETS)
+POOL_CHECKOUT_FAILURES = Counter(
+    'fyyur_db_pool_checkout_failures', 'Checkouts that failed, by reason (timeout or error).', ['reason'])
+POOL_CHECKED_OUT = Gauge(
+    'fyyur_db_pool_checked_out_connections', 'Database connections in use.', multiprocess_mode='livesum')
+
+
+def endpoint():
+    return request.endpoint or 'none'
+
+
+class Metrics(object):
+
+    def __init__(self, app=None):
+        self.app = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if not app.config['METRICS']:
+            return
+        self.app = app
+        app.before_request(self.start_request)
+        app.after_request(self.record_status)
+        app.teardown_request(self.finish_request)
+        got_request_exception.connect(self.count_exception, app)
+        before_render_template.connect(self.start_render, app)
+        template_rendered.connect(self.finish_render, app)
+        CheckoutMetrics.listeners.append(self.record_checkout)
+        event.listen(Pool, 'checkout', self.connection_checked_out)
+        event.listen(Pool, 'checkin', self.connection_checked_in)
+        app.add_url_rule('/metrics', 'metrics', self.scrape)
+
+    def start_request(self):
+        g.metrics_started = time.perf_counter()
+        IN_PROGRESS.labels(endpoint()).inc()
+
+    def record_status(self, response):
+        g.metrics_status = response.status_code
+        return response
+
+    def finish_request(self, error):
+        # after a streamed body has been sent; an earlier before_request
+        # hook may have answered before start_request ran
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return
+        IN_PROGRESS.labels(endpoint()).dec()
+        REQUEST_SECONDS.labels(endpoint(), request.method).observe(time.perf_counter() - started)
+        RESPONSES.labels(endpoint(), request.method, g.pop('metrics_status', 500)).inc()
+
+    def count_exception(self, sender, exception, **extra):
+        EXCEPTIONS.labels(endpoint(), type(exception).__name__).inc()
+
+    def start_render(self, sender, template, context, **extra):
+        g.setdefault('metrics_renders', []).append(time.perf_counter())
+
+    def finish_render(self, sender, template, context, **extra):
+        started = g.metrics_renders.pop()
+        TEMPLATE_SECONDS.labels(template.name).observe(time.perf_counter() - started)
+
+    def page_cache_lookup(self, hit):
+        if self.app is not None:
+            PAGE_CACHE_LOOKUPS.labels('hit' if hit else 'miss').inc()
+
+    def record_checkout(self, seconds, error):
+        if error is None:
+            POOL_WAIT_SECONDS.observe(seconds)
+        else:
+            POOL_CHECKOUT_FAILURES.labels('timeout' if isinstance(error, exc.TimeoutError) else 'error').inc()
+
+    def connection_checked_out(self, dbapi_connection, connection_record, connection_proxy):
+        POOL_CHECKED_OUT.inc()
+
+    def connection_checked_in(self, dbapi_connection, connection_record):
+        POOL_CHECKED_OUT.dec()
+
+    def scrape(self):
+        if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+        else:
+            registry = REGISTRY
+        return Response(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,34 @@
+"""Show primary key on id alone; indexes for the listing and detail queries
+
+Revision ID: 87aa565f8a1a
+Revises: e4e4a576f6f8
+Create Date: 2026-10-18 10:02:17.553901
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '87aa565f8a1a'
+down_revision = 'e4e4a576f6f8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.drop_constraint('Show_pkey', 'Show', type_='primary')
+    op.create_primary_key('Show_pkey', 'Show', ['id'])
+    op.create_index('ix_Show_venue_id_start_time', 'Show', ['venue_id', 'start_time'], unique=False)
+    op.create_index('ix_Show_artist_id_start_time', 'Show', ['artist_id', 'start_time'], unique=False)
+    op.create_index('ix_Show_start_time', 'Show', ['start_time', 'id'], unique=False)
+    op.create_index('ix_Venue_city_state', 'Venue', ['city', 'state', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_Venue_city_state', table_name='Venue')
+    op.drop_index('ix_Show_start_time', table_name='Show')
+    op.drop_index('ix_Show_artist_id_start_time', table_name='Show')
+    op.drop_index('ix_Show_venue_id_start_time', table_name='Show')
+    op.drop_constraint('Show_pkey', 'Show', type_='primary')
+    op.create_primary_key('Show_pkey', 'Show', ['id', 'artist_id', 'venue_id'])
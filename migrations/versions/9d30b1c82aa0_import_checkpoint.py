@@ -0,0 +1,28 @@
+"""ImportCheckpoint table for resumable bulk imports
+
+Revision ID: 9d30b1c82aa0
+Revises: 87aa565f8a1a
+Create Date: 2026-10-18 11:24:05.190348
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d30b1c82aa0'
+down_revision = '87aa565f8a1a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('ImportCheckpoint',
+    sa.Column('source', sa.String(), nullable=False),
+    sa.Column('records', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('source')
+    )
+
+
+def downgrade():
+    op.drop_table('ImportCheckpoint')
@@ -0,0 +1,198 @@
+"""summary tables behind /stats, kept current by triggers
+
+Revision ID: b7c41e2f5a90
+Revises: 9d30b1c82aa0
+Create Date: 2026-10-18 13:02:51.604127
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7c41e2f5a90'
+down_revision = '9d30b1c82aa0'
+branch_labels = None
+depends_on = None
+
+
+# Statement-level triggers with transition tables, so a bulk COPY of shows
+# updates each summary row once per statement rather than once per show.
+# Null cities and states are counted under ''.
+FUNCTIONS = '''
+CREATE FUNCTION stats_count_shows(venue_ids integer[], artist_ids integer[], days date[], delta integer)
+RETURNS void LANGUAGE sql AS $$
+  INSERT INTO "StatsVenue" (venue_id, num_shows)
+    SELECT venue_id, delta * count(*) FROM unnest(venue_ids) AS venue_id GROUP BY venue_id
+    ON CONFLICT (venue_id) DO UPDATE SET num_shows = "StatsVenue".num_shows + EXCLUDED.num_shows;
+  INSERT INTO "StatsArtist" (artist_id, num_shows)
+    SELECT artist_id, delta * count(*) FROM unnest(artist_ids) AS artist_id GROUP BY artist_id
+    ON CONFLICT (artist_id) DO UPDATE SET num_shows = "StatsArtist".num_shows + EXCLUDED.num_shows;
+  INSERT INTO "StatsCityDay" (city, state, day, num_shows)
+    SELECT coalesce(v.city, ''), coalesce(v.state, ''), s.day, delta * count(*)
+    FROM unnest(venue_ids, days) AS s (venue_id, day) JOIN "Venue" v ON v.id = s.venue_id
+    GROUP BY 1, 2, 3
+    ON CONFLICT (city, state, day) DO UPDATE SET num_shows = "StatsCityDay".num_shows + EXCLUDED.num_shows;
+  INSERT INTO "StatsGenre" (genre, num_venues, num_artists, num_shows)
+    SELECT g.genre, 0, 0, delta * count(*)
+    FROM unnest(artist_ids) AS s (artist_id) JOIN "Artist" a ON a.id = s.artist_id
+    CROSS JOIN unnest(a.genres) AS g (genre)
+    GROUP BY g.genre
+    ON CONFLICT (genre) DO UPDATE SET num_shows = "StatsGenre".num_shows + EXCLUDED.num_shows;
+$$;
+
+CREATE FUNCTION stats_show_changed() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+  IF TG_OP IN ('UPDATE', 'DELETE') THEN
+    PERFORM stats_count_shows(ARRAY(SELECT venue_id FROM old_rows), ARRAY(SELECT artist_id FROM old_rows),
+                              ARRAY(SELECT start_time FROM old_rows), -1);
+  END IF;
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    PERFORM stats_count_shows(ARRAY(SELECT venue_id FROM new_rows), ARRAY(SELECT artist_id FROM new_rows),
+                              ARRAY(SELECT start_time FROM new_rows), 1);
+  END IF;
+  RETURN NULL;
+END $$;
+
+CREATE FUNCTION stats_venue_changed() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+  IF TG_OP IN ('UPDATE', 'DELETE') THEN
+    INSERT INTO "StatsGenre" (genre, num_venues, num_artists, num_shows)
+      SELECT g.genre, -count(*), 0, 0 FROM old_rows CROSS JOIN unnest(old_rows.genres) AS g (genre) GROUP BY g.genre
+      ON CONFLICT (genre) DO UPDATE SET num_venues = "StatsGenre".num_venues + EXCLUDED.num_venues;
+  END IF;
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    INSERT INTO "StatsGenre" (genre, num_venues, num_artists, num_shows)
+      SELECT g.genre, count(*), 0, 0 FROM new_rows CROSS JOIN unnest(new_rows.genres) AS g (genre) GROUP BY g.genre
+      ON CONFLICT (genre) DO UPDATE SET num_venues = "StatsGenre".num_venues + EXCLUDED.num_venues;
+  END IF;
+  IF TG_OP = 'UPDATE' THEN
+    -- a venue that moved takes its shows' day counts to its new city
+    INSERT INTO "StatsCityDay" (city, state, day, num_shows)
+      SELECT coalesce(o.city, ''), coalesce(o.state, ''), s.start_time, -count(*)
+      FROM old_rows o JOIN new_rows n ON n.id = o.id JOIN "Show" s ON s.venue_id = o.id
+      WHERE (o.city, o.state) IS DISTINCT FROM (n.city, n.state)
+      GROUP BY 1, 2, 3
+      ON CONFLICT (city, state, day) DO UPDATE SET num_shows = "StatsCityDay".num_shows + EXCLUDED.num_shows;
+    INSERT INTO "StatsCityDay" (city, state, day, num_shows)
+      SELECT coalesce(n.city, ''), coalesce(n.state, ''), s.start_time, count(*)
+      FROM old_rows o JOIN new_rows n ON n.id = o.id JOIN "Show" s ON s.venue_id = n.id
+      WHERE (o.city, o.state) IS DISTINCT FROM (n.city, n.state)
+      GROUP BY 1, 2, 3
+      ON CONFLICT (city, state, day) DO UPDATE SET num_shows = "StatsCityDay".num_shows + EXCLUDED.num_shows;
+  END IF;
+  RETURN NULL;
+END $$;
+
+CREATE FUNCTION stats_artist_changed() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+  IF TG_OP IN ('UPDATE', 'DELETE') THEN
+    INSERT INTO "StatsGenre" (genre, num_venues, num_artists, num_shows)
+      SELECT g.genre, 0, -count(*), 0 FROM old_rows CROSS JOIN unnest(old_rows.genres) AS g (genre) GROUP BY g.genre
+      ON CONFLICT (genre) DO UPDATE SET num_artists = "StatsGenre".num_artists + EXCLUDED.num_artists;
+  END IF;
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    INSERT INTO "StatsGenre" (genre, num_venues, num_artists, num_shows)
+      SELECT g.genre, 0, count(*), 0 FROM new_rows CROSS JOIN unnest(new_rows.genres) AS g (genre) GROUP BY g.genre
+      ON CONFLICT (genre) DO UPDATE SET num_artists = "StatsGenre".num_artists + EXCLUDED.num_artists;
+  END IF;
+  IF TG_OP = 'UPDATE' THEN
+    -- shows are counted under their artist's genres: move them with a genre change
+    INSERT INTO "StatsGenre" (genre, num_venues, num_artists, num_shows)
+      SELECT g.genre, 0, 0, sum(c.num_shows)
+      FROM (SELECT n.genres, sa.num_shows FROM new_rows n JOIN "StatsArtist" sa ON sa.artist_id = n.id
+            UNION ALL
+            SELECT o.genres, -sa.num_shows FROM old_rows o JOIN "StatsArtist" sa ON sa.artist_id = o.id) AS c
+      CROSS JOIN unnest(c.genres) AS g (genre)
+      GROUP BY g.genre
+      ON CONFLICT (genre) DO UPDATE SET num_shows = "StatsGenre".num_shows + EXCLUDED.num_shows;
+  END IF;
+  RETURN NULL;
+END $$;
+'''
+
+TRIGGERS = [
+    ('Show', 'stats_show_changed', 'INSERT', 'NEW TABLE AS new_rows'),
+    ('Show', 'stats_show_changed', 'UPDATE', 'OLD TABLE AS old_rows NEW TABLE AS new_rows'),
+    ('Show', 'stats_show_changed', 'DELETE', 'OLD TABLE AS old_rows'),
+    ('Venue', 'stats_venue_changed', 'INSERT', 'NEW TABLE AS new_rows'),
+    ('Venue', 'stats_venue_changed', 'UPDATE', 'OLD TABLE AS old_rows NEW TABLE AS new_rows'),
+    ('Venue', 'stats_venue_changed', 'DELETE', 'OLD TABLE AS old_rows'),
+    ('Artist', 'stats_artist_changed', 'INSERT', 'NEW TABLE AS new_rows'),
+    ('Artist', 'stats_artist_changed', 'UPDATE', 'OLD TABLE AS old_rows NEW TABLE AS new_rows'),
+    ('Artist', 'stats_artist_changed', 'DELETE', 'OLD TABLE AS old_rows'),
+]
+
+BACKFILL = '''
+INSERT INTO "StatsVenue" (venue_id, num_shows)
+  SELECT venue_id, count(*) FROM "Show" GROUP BY venue_id;
+INSERT INTO "StatsArtist" (artist_id, num_shows)
+  SELECT artist_id, count(*) FROM "Show" GROUP BY artist_id;
+INSERT INTO "StatsCityDay" (city, state, day, num_shows)
+  SELECT coalesce(v.city, ''), coalesce(v.state, ''), s.start_time, count(*)
+  FROM "Show" s JOIN "Venue" v ON v.id = s.venue_id GROUP BY 1, 2, 3;
+INSERT INTO "StatsGenre" (genre, num_venues, num_artists, num_shows)
+  SELECT genre, sum(num_venues), sum(num_artists), sum(num_shows) FROM (
+    SELECT g.genre, count(*) AS num_venues, 0 AS num_artists, 0 AS num_shows
+      FROM "Venue" CROSS JOIN unnest("Venue".genres) AS g (genre) GROUP BY g.genre
+    UNION ALL
+    SELECT g.genre, 0, count(*), 0
+      FROM "Artist" CROSS JOIN unnest("Artist".genres) AS g (genre) GROUP BY g.genre
+    UNION ALL
+    SELECT g.genre, 0, 0, count(*)
+      FROM "Show" s JOIN "Artist" a ON a.id = s.artist_id CROSS JOIN unnest(a.genres) AS g (genre) GROUP BY g.genre
+  ) AS counts GROUP BY genre;
+'''
+
+
+def upgrade():
+    op.create_table('StatsVenue',
+    sa.Column('venue_id', sa.Integer(), nullable=False),
+    sa.Column('num_shows', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['venue_id'], ['Venue.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('venue_id')
+    )
+    op.create_index('ix_StatsVenue_num_shows', 'StatsVenue', ['num_shows', 'venue_id'], unique=False)
+    op.create_table('StatsArtist',
+    sa.Column('artist_id', sa.Integer(), nullable=False),
+    sa.Column('num_shows', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['artist_id'], ['Artist.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('artist_id')
+    )
+    op.create_index('ix_StatsArtist_num_shows', 'StatsArtist', ['num_shows', 'artist_id'], unique=False)
+    op.create_table('StatsCityDay',
+    sa.Column('city', sa.String(length=120), nullable=False),
+    sa.Column('state', sa.String(length=120), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('num_shows', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('city', 'state', 'day')
+    )
+    op.create_index('ix_StatsCityDay_day', 'StatsCityDay', ['day'], unique=False)
+    op.create_table('StatsGenre',
+    sa.Column('genre', sa.String(), nullable=False),
+    sa.Column('num_venues', sa.Integer(), nullable=False),
+    sa.Column('num_artists', sa.Integer(), nullable=False),
+    sa.Column('num_shows', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('genre')
+    )
+    op.execute(FUNCTIONS)
+    for table, function, event, referencing in TRIGGERS:
+        op.execute('CREATE TRIGGER "%s_%s_%s" AFTER %s ON "%s" REFERENCING %s '
+                   'FOR EACH STATEMENT EXECUTE FUNCTION %s()' % (
+                       function, event.lower(), table, event, table, referencing, function))
+    op.execute(BACKFILL)
+
+
+def downgrade():
+    for table, function, event, referencing in TRIGGERS:
+        op.execute('DROP TRIGGER "%s_%s_%s" ON "%s"' % (function, event.lower(), table, table))
+    for function in ('stats_artist_changed()', 'stats_venue_changed()', 'stats_show_changed()',
+                     'stats_count_shows(integer[], integer[], date[], integer)'):
+        op.execute('DROP FUNCTION %s' % function)
+    op.drop_table('StatsGenre')
+    op.drop_index('ix_StatsCityDay_day', table_name='StatsCityDay')
+    op.drop_table('StatsCityDay')
+    op.drop_index('ix_StatsArtist_num_shows', table_name='StatsArtist')
+    op.drop_table('StatsArtist')
+    op.drop_index('ix_StatsVenue_num_shows', table_name='StatsVenue')
+    op.drop_table('StatsVenue')
@@ -0,0 +1,26 @@
+"""GIN indexes on venue and artist genres
+
+Revision ID: c3e8a1d04f27
+Revises: b7c41e2f5a90
+Create Date: 2026-10-18 16:05:12.508341
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3e8a1d04f27'
+down_revision = 'b7c41e2f5a90'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_Venue_genres', 'Venue', ['genres'], unique=False, postgresql_using='gin')
+    op.create_index('ix_Artist_genres', 'Artist', ['genres'], unique=False, postgresql_using='gin')
+
+
+def downgrade():
+    op.drop_index('ix_Artist_genres', table_name='Artist')
+    op.drop_index('ix_Venue_genres', table_name='Venue')
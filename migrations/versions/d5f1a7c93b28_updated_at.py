@@ -0,0 +1,66 @@
+"""updated_at on venues, artists and shows, and the time of the last delete per table
+
+Revision ID: d5f1a7c93b28
+Revises: c3e8a1d04f27
+Create Date: 2026-10-18 18:41:07.216530
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5f1a7c93b28'
+down_revision = 'c3e8a1d04f27'
+branch_labels = None
+depends_on = None
+
+TABLES = ['Venue', 'Artist', 'Show']
+
+FUNCTIONS = '''
+CREATE FUNCTION touch_updated_at() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+  NEW.updated_at := clock_timestamp();
+  RETURN NEW;
+END $$;
+
+CREATE FUNCTION note_deletion() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+  IF EXISTS (SELECT 1 FROM old_rows) THEN
+    INSERT INTO "LastDeletion" (table_name, deleted_at) VALUES (TG_TABLE_NAME, clock_timestamp())
+      ON CONFLICT (table_name) DO UPDATE SET deleted_at = EXCLUDED.deleted_at;
+  END IF;
+  RETURN NULL;
+END $$;
+'''
+
+
+def upgrade():
+    op.create_table('LastDeletion',
+    sa.Column('table_name', sa.String(), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('table_name')
+    )
+    op.execute(FUNCTIONS)
+    for table in TABLES:
+        # now() is evaluated once, so existing rows are not rewritten; new
+        # rows then take the time they are written
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False,
+                                       server_default=sa.text('now()')))
+        op.alter_column(table, 'updated_at', server_default=sa.text('clock_timestamp()'))
+        op.create_index('ix_%s_updated_at' % table, table, ['updated_at'], unique=False)
+        op.execute('CREATE TRIGGER "touch_updated_at_%s" BEFORE UPDATE ON "%s" '
+                   'FOR EACH ROW EXECUTE FUNCTION touch_updated_at()' % (table, table))
+        op.execute('CREATE TRIGGER "note_deletion_%s" AFTER DELETE ON "%s" REFERENCING OLD TABLE AS old_rows '
+                   'FOR EACH STATEMENT EXECUTE FUNCTION note_deletion()' % (table, table))
+
+
+def downgrade():
+    for table in TABLES:
+        op.execute('DROP TRIGGER "note_deletion_%s" ON "%s"' % (table, table))
+        op.execute('DROP TRIGGER "touch_updated_at_%s" ON "%s"' % (table, table))
+        op.drop_index('ix_%s_updated_at' % table, table_name=table)
+        op.drop_column(table, 'updated_at')
+    op.execute('DROP FUNCTION note_deletion()')
+    op.execute('DROP FUNCTION touch_updated_at()')
+    op.drop_table('LastDeletion')
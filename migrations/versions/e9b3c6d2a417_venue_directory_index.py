@@ -0,0 +1,25 @@
+"""index on the venue directory's null-safe sort key
+
+Revision ID: e9b3c6d2a417
+Revises: d5f1a7c93b28
+Create Date: 2026-10-18 20:12:38.904151
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e9b3c6d2a417'
+down_revision = 'd5f1a7c93b28'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_Venue_directory', 'Venue',
+                    [sa.text("coalesce(city, '')"), sa.text("coalesce(state, '')"), 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_Venue_directory', table_name='Venue')
@@ -0,0 +1,105 @@
+import threading
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.pool import QueuePool
+
+# Connection pool that records how long each checkout waited for a
+# connection. Selected with SQLALCHEMY_ENGINE_OPTIONS['poolclass'] in
+# config.py; the numbers are served by /pool/stats. Sustained waits, or any
+# timeouts, mean the workers together want more connections than
+# pool_size + max_overflow allows. Callables in CheckoutMetrics.listeners
+# are also told of every checkout (metrics.py exports them to Prometheus).
+
+
+class CheckoutMetrics(object):
+
+    # upper bounds, in seconds, of the wait time histogram
+    BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, float('inf'))
+
+    # listener(seconds, error) for every checkout of every pool
+    listeners = []
+
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.waiting = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.buckets = [0] * len(self.BUCKETS)
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            self.waiting += 1
+        return time.perf_counter()
+
+    def finish(self, started, error=None):
+        seconds = time.perf_counter() - started
+        for listener in self.listeners:
+            listener(seconds, error)
+        with self._lock:
+            self.waiting -= 1
+            if error is not None:
+                if isinstance(error, exc.TimeoutError):
+                    self.timeouts += 1
+                else:
+                    self.errors += 1
+                return
+            self.checkouts += 1
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+            for i, bound in enumerate(self.BUCKETS):
+                if seconds <= bound:
+                    self.buckets[i] += 1
+                    break
+
+    def stats(self):
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "errors": self.errors,
+                "waiting": self.waiting,
+                "wait_seconds_total": self.wait_seconds_total,
+                "wait_seconds_max": self.wait_seconds_max,
+                "wait_seconds_mean": self.wait_seconds_total / self.checkouts if self.checkouts else 0.0,
+                "wait_seconds_buckets": {
+                    ('+Inf' if bound == float('inf') else repr(bound)): count
+                    for bound, count in zip(self.BUCKETS, self.buckets)
+                },
+            }
+
+
+class MeteredQueuePool(QueuePool):
+
+    def __init__(self, *args, **kwargs):
+        super(MeteredQueuePool, self).__init__(*args, **kwargs)
+        self.metrics = CheckoutMetrics()
+
+    def _do_get(self):
+        started = self.metrics.start()
+        try:
+            connection = super(MeteredQueuePool, self)._do_get()
+        except Exception as e:
+            self.metrics.finish(started, e)
+            raise
+        self.metrics.finish(started)
+        return connection
+
+    def recreate(self):
+        # keep the counters when the engine replaces its pool (dispose)
+        pool = super(MeteredQueuePool, self).recreate()
+        pool.metrics = self.metrics
+        return pool
+
+    def stats(self):
+        stats = self.metrics.stats()
+        stats.update({
+            "size": self.size(),
+            "checked_out": self.checkedout(),
+            "overflow": max(self.overflow(), 0),
+            "max_overflow": self._max_overflow,
+        })
+        return stats
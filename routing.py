@@ -0,0 +1,46 @@
+import random
+
+from flask import g
+from flask_sqlalchemy import SignallingSession, SQLAlchemy, get_state
+from sqlalchemy import orm
+
+# Read-replica routing. Replicas are Flask-SQLAlchemy binds named replica0,
+# replica1, ... (see config.py), so they get the same engine options and
+# pool as the primary. A request that calls use_replica() sends its reads
+# to one replica, picked at random for the whole request; everything else,
+# and any flush, goes to the primary.
+
+
+class RoutingSession(SignallingSession):
+
+    def __init__(self, db, replica_engines=None, **options):
+        # replica_engines: bind name -> engine, replacing the binds' own
+        # engines (the async server passes its asyncpg-backed ones)
+        self.replica_engines = replica_engines
+        super(RoutingSession, self).__init__(db, **options)
+
+    def get_bind(self, mapper=None, clause=None):
+        bind = g.get('db_replica') if not self._flushing else None
+        if bind is not None:
+            if self.replica_engines is not None:
+                return self.replica_engines[bind]
+            return get_state(self.app).db.get_engine(self.app, bind)
+        return super(RoutingSession, self).get_bind(mapper, clause)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+    def replicas(self, app=None):
+        binds = self.get_app(app).config.get('SQLALCHEMY_BINDS') or {}
+        return sorted(bind for bind in binds if bind.startswith('replica'))
+
+    def use_replica(self):
+        """Route the rest of this request's reads to a replica, if any are
+        configured. Call before the first query of the request."""
+        replicas = self.replicas()
+        if replicas and 'db_replica' not in g:
+            g.db_replica = random.choice(replicas)
+        return g.get('db_replica')
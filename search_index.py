@@ -0,0 +1,147 @@
+import re
+import threading
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(text):
+    return WORD_RE.findall((text or '').lower())
+
+
+class _Node(object):
+    __slots__ = ('children', 'keys', 'count')
+
+    def __init__(self):
+        self.children = {}
+        # ids having a word that ends here, as an insertion-ordered set
+        self.keys = None
+        # words inserted at or below this node
+        self.count = 0
+
+
+class PrefixIndex(object):
+    """In-memory word-prefix index over (kind, id) -> name entries.
+
+    Every word of a name is inserted into a character trie, so "hop" and
+    "mus" both find "The Musical Hop". Words are truncated to
+    ``max_word_length`` characters, which bounds the depth of the trie and
+    so its size to O(total name length). All access goes through one lock;
+    lookups walk the least populated of the query's prefixes and stop as
+    soon as ``limit`` results are found. Each entry keeps its words as one
+    space-separated string, so checking it for the other prefixes is a
+    substring search per prefix.
+    """
+
+    def __init__(self, max_word_length=24):
+        self.max_word_length = max_word_length
+        self._roots = {}
+        # kind -> id -> (name, " word word ...")
+        self._names = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return sum(len(names) for names in self._names.values())
+
+    def _words(self, name):
+        return set(word[:self.max_word_length] for word in tokenize(name))
+
+    def add(self, kind, id, name):
+        """Insert or replace the entry for ``(kind, id)``."""
+        words = self._words(name)
+        entry = (name, ''.join(' ' + word for word in words))
+        with self._lock:
+            self._remove(kind, id)
+            self._names.setdefault(kind, {})[id] = entry
+            root = self._roots.setdefault(kind, _Node())
+            for word in words:
+                node = root
+                node.count += 1
+                for char in word:
+                    child = node.children.get(char)
+                    if child is None:
+                        child = node.children[char] = _Node()
+                    node = child
+                    node.count += 1
+                if node.keys is None:
+                    node.keys = {}
+                node.keys[id] = None
+
+    def remove(self, kind, id):
+        with self._lock:
+            self._remove(kind, id)
+
+    def _remove(self, kind, id):
+        entry = self._names.get(kind, {}).pop(id, None)
+        if entry is None:
+            return
+        root = self._roots[kind]
+        for word in entry[1].split():
+            node = root
+            node.count -= 1
+            for char in word:
+                child = node.children[char]
+                child.count -= 1
+                if not child.count:
+                    # nothing else below: drop the whole branch
+                    del node.children[char]
+                    break
+                node = child
+            else:
+                del node.keys[id]
+                if not node.keys:
+                    node.keys = None
+
+    def clear(self):
+        with self._lock:
+            self._roots.clear()
+            self._names.clear()
+
+    def search(self, kind, query, limit=10):
+        """Up to ``limit`` (id, name) pairs having a word starting with each
+        query token, ordered by matched word, then by insertion."""
+        tokens = [token[:self.max_word_length] for token in tokenize(query)]
+        if not tokens:
+            return []
+        results = []
+        with self._lock:
+            root = self._roots.get(kind)
+            if root is None:
+                return []
+            names = self._names[kind]
+            # walk the rarest prefix, check the others against the entries
+            nodes = [self._find(root, token) for token in tokens]
+            if None in nodes:
+                return []
+            rarest = min(range(len(tokens)), key=lambda i: nodes[i].count)
+            prefixes = [' ' + token for i, token in enumerate(tokens) if i != rarest]
+            found = set()
+            stack = [nodes[rarest]]
+            while stack and len(results) < limit:
+                node = stack.pop()
+                if node.keys:
+                    for id in node.keys:
+                        name, words = names[id]
+                        for prefix in prefixes:
+                            if prefix not in words:
+                                break
+                        else:
+                            # found already under an earlier word of its own
+                            if id in found:
+                                continue
+                            found.add(id)
+                            results.append((id, name))
+                            if len(results) >= limit:
+                                break
+                children = node.children
+                if len(children) > 1:
+                    stack.extend([children[char] for char in sorted(children, reverse=True)])
+                else:
+                    stack.extend(children.values())
+        return results
+
+    def _find(self, node, prefix):
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return None
+        return node
@@ -0,0 +1,70 @@
+"""Fixtures for the Fyyur tests.
+
+The tests run the app against the Postgres database at ``DATABASE_URL``
+(see "Benchmarks" in the README for a throwaway one, after
+``flask db upgrade``), and are skipped without it. Rows they create are named
+with ``TEST_PREFIX`` and deleted again afterwards. The replica routing tests
+also need a second, migrated database at ``REPLICA_DATABASE_URL``, which
+stands in for a replica that has not caught up with the primary.
+"""
+import os
+import sys
+
+import pytest
+from flask_sqlalchemy import get_state
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+TEST_PREFIX = 'test-'
+
+
+@pytest.fixture(scope='session')
+def fyyur():
+    if not os.environ.get('DATABASE_URL'):
+        pytest.skip('DATABASE_URL is not set')
+    import app as fyyur
+    fyyur.app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    # every request renders: the tests write rows behind the cache's back
+    fyyur.page_cache = None
+    return fyyur
+
+
+@pytest.fixture
+def client(fyyur):
+    return fyyur.app.test_client()
+
+
+def delete_test_rows(fyyur):
+    fyyur.db.session.rollback()
+    Show, Venue, Artist = fyyur.Show, fyyur.Venue, fyyur.Artist
+    venue_ids = fyyur.db.session.query(Venue.id).filter(Venue.name.like(TEST_PREFIX + '%'))
+    artist_ids = fyyur.db.session.query(Artist.id).filter(Artist.name.like(TEST_PREFIX + '%'))
+    Show.query.filter(Show.venue_id.in_(venue_ids) |
+                      Show.artist_id.in_(artist_ids)).delete(synchronize_session=False)
+    Venue.query.filter(Venue.name.like(TEST_PREFIX + '%')).delete(synchronize_session=False)
+    Artist.query.filter(Artist.name.like(TEST_PREFIX + '%')).delete(synchronize_session=False)
+    fyyur.db.session.commit()
+
+
+@pytest.fixture
+def context(fyyur):
+    with fyyur.app.app_context():
+        yield
+        delete_test_rows(fyyur)
+
+
+@pytest.fixture
+def replica(fyyur):
+    url = os.environ.get('REPLICA_DATABASE_URL')
+    if not url:
+        pytest.skip('REPLICA_DATABASE_URL is not set')
+    binds = fyyur.app.config['SQLALCHEMY_BINDS']
+    fyyur.app.config['SQLALCHEMY_BINDS'] = dict(binds or {}, replica0=url)
+    try:
+        yield fyyur.db.get_engine(fyyur.app, 'replica0')
+    finally:
+        fyyur.db.get_engine(fyyur.app, 'replica0').dispose()
+        fyyur.app.config['SQLALCHEMY_BINDS'] = binds
+        del get_state(fyyur.app).connectors['replica0']
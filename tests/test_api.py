@@ -0,0 +1,40 @@
+import pytest
+
+from conftest import TEST_PREFIX
+
+
+@pytest.mark.parametrize('path,status', [
+    ('/api/v1/venues/2147483647', 404),
+    ('/api/v1/artists/2147483647', 404),
+    ('/api/v1/nowhere', 404),
+    ('/api/v1/venues/available', 400),
+    ('/api/v1/venues/available?city=Austin&state=TX&from=someday', 400),
+    ('/api/v1/venues/available?city=Austin&state=TX&from=2020-01-02&to=2020-01-01', 400),
+])
+def test_api_errors_are_json(client, path, status):
+    response = client.get(path)
+    assert response.status_code == status
+    assert response.is_json
+    assert set(response.get_json()) == {'error'}
+
+
+def test_api_method_not_allowed_keeps_allow_header(client):
+    response = client.post('/api/v1/venues')
+    assert response.status_code == 405
+    assert response.is_json
+    assert 'GET' in response.headers['Allow']
+
+
+def test_api_venue_is_json(fyyur, client, context):
+    venue = fyyur.Venue(name=TEST_PREFIX + 'venue', city='Austin', state='TX', genres=[TEST_PREFIX + 'genre'])
+    fyyur.db.session.add(venue)
+    fyyur.db.session.commit()
+    response = client.get('/api/v1/venues/%d' % venue.id)
+    assert response.status_code == 200
+    assert response.get_json()['name'] == TEST_PREFIX + 'venue'
+
+
+def test_page_errors_stay_html(client):
+    response = client.get('/venues/2147483647')
+    assert response.status_code == 404
+    assert response.mimetype == 'text/html'
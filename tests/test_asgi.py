@@ -0,0 +1,48 @@
+import asyncio
+
+import pytest
+
+
+@pytest.fixture
+def asgi(fyyur):
+    import asgi
+    return asgi
+
+
+def scope(path, root_path=''):
+    return {'type': 'http', 'method': 'GET', 'path': path, 'root_path': root_path, 'query_string': b'',
+            'headers': [(b'host', b'localhost')], 'http_version': '1.1', 'scheme': 'http'}
+
+
+def call(application, scope):
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b''}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(application(scope, receive, send))
+    return messages[0]['status'], b''.join(message.get('body', b'') for message in messages[1:])
+
+
+@pytest.mark.parametrize('path,path_info', [
+    ('/artists/search%41', '/artists/search%41'),
+    ('/venues/日本', '/venues/\xe6\x97\xa5\xe6\x9c\xac'),
+])
+def test_path_is_decoded_once_into_a_native_string(asgi, path, path_info):
+    environ = asgi.wsgi_environ(scope(path, root_path='/fyyür'), b'')
+    assert environ['PATH_INFO'] == path_info
+    assert environ['SCRIPT_NAME'] == '/fyy\xc3\xbcr'
+    assert asgi.read_only(environ) is False
+
+
+def test_read_only_views_are_recognised(asgi):
+    assert asgi.read_only(asgi.wsgi_environ(scope('/venues/1'), b'')) is True
+    assert asgi.read_only(asgi.wsgi_environ(scope('/venues/create'), b'')) is False
+
+
+def test_unknown_non_ascii_path_is_not_found(asgi):
+    status, _ = call(asgi.Application(threads=1), scope('/日本'))
+    assert status == 404
@@ -0,0 +1,116 @@
+import pytest
+
+import cache
+
+
+class Clock(object):
+    # stands in for the time module: every reading is a millisecond later,
+    # so no two SQLite `used` stamps tie
+
+    def __init__(self):
+        self.now = 1000000.0
+
+    def time(self):
+        self.now += 0.001
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache, 'time', clock)
+    return clock
+
+
+@pytest.fixture(params=['lru', 'sqlite'])
+def page_cache(request, tmp_path, clock):
+    return cache.from_config({'PAGE_CACHE': request.param, 'PAGE_CACHE_SIZE': 3,
+                              'PAGE_CACHE_PATH': str(tmp_path / 'page_cache.sqlite')})
+
+
+def test_get_returns_what_was_set(page_cache):
+    assert page_cache.get('/venues') is None
+    assert page_cache.set('/venues', b'venues', ['venues'])
+    assert page_cache.get('/venues') == b'venues'
+    assert page_cache.set('/venues', b'venues again', ['venues'])
+    assert page_cache.get('/venues') == b'venues again'
+    assert page_cache.stats()['entries'] == 1
+    assert (page_cache.hits, page_cache.misses) == (2, 1)
+
+
+def test_invalidate_drops_only_pages_with_the_tags(page_cache):
+    page_cache.set('/venues', b'venues', ['venues', 'venue:1', 'venue:2'])
+    page_cache.set('/venues/1', b'venue 1', ['venue:1'])
+    page_cache.set('/artists', b'artists', ['artists'])
+    assert page_cache.invalidate('venue:1') == 2
+    assert page_cache.get('/venues') is None
+    assert page_cache.get('/venues/1') is None
+    assert page_cache.get('/artists') == b'artists'
+    assert page_cache.invalidate('venue:2', 'nothing') == 0
+    assert page_cache.stats()['invalidations'] == 2
+
+
+def test_replacing_a_page_replaces_its_tags(page_cache):
+    page_cache.set('/venues/1', b'venue 1', ['venue:1', 'artist:1'])
+    page_cache.set('/venues/1', b'venue 1', ['venue:1'])
+    assert page_cache.invalidate('artist:1') == 0
+    assert page_cache.get('/venues/1') == b'venue 1'
+
+
+def test_page_rendered_before_an_invalidation_is_not_stored(page_cache):
+    generation = page_cache.generation()
+    page_cache.invalidate('venue:1')
+    assert not page_cache.set('/venues/1', b'stale', ['venue:1'], generation)
+    assert page_cache.get('/venues/1') is None
+    assert page_cache.set('/venues/1', b'fresh', ['venue:1'], page_cache.generation())
+    assert page_cache.get('/venues/1') == b'fresh'
+
+
+def test_clear_drops_everything_and_moves_the_generation(page_cache):
+    page_cache.set('/venues', b'venues', ['venues'])
+    generation = page_cache.generation()
+    page_cache.clear()
+    assert page_cache.get('/venues') is None
+    assert page_cache.stats()['entries'] == 0
+    assert not page_cache.set('/venues', b'stale', ['venues'], generation)
+
+
+def test_least_recently_used_page_is_evicted(page_cache):
+    for key in ('/a', '/b', '/c'):
+        page_cache.set(key, key.encode(), [key])
+    page_cache.get('/a')
+    page_cache.set('/d', b'/d', ['/d'])
+    assert page_cache.get('/b') is None
+    assert [page_cache.get(key) for key in ('/a', '/c', '/d')] == [b'/a', b'/c', b'/d']
+    assert page_cache.stats()['evictions'] == 1
+    # the evicted page's tags went with it
+    assert page_cache.invalidate('/b') == 0
+
+
+def test_page_expires(page_cache, clock):
+    page_cache.set('/venues', b'venues', ['venues'], expires=clock.now + 60)
+    page_cache.set('/artists', b'artists', ['artists'])
+    assert page_cache.get('/venues') == b'venues'
+    clock.now += 60
+    assert page_cache.get('/venues') is None
+    assert page_cache.get('/artists') == b'artists'
+    assert page_cache.stats()['expirations'] == 1
+    assert page_cache.stats()['entries'] == 1
+    assert page_cache.invalidate('venues') == 0
+
+
+def test_sqlite_backend_is_shared_between_instances(tmp_path, clock):
+    path = str(tmp_path / 'page_cache.sqlite')
+    one, other = cache.SQLiteBackend(path), cache.SQLiteBackend(path)
+    one.set('/venues', b'venues', ['venues'])
+    generation = other.generation()
+    assert other.get('/venues') == b'venues'
+    one.delete_tags(['venues'])
+    assert other.get('/venues') is None
+    assert not other.set('/venues', b'stale', ['venues'], generation)
+
+
+def test_unknown_backend_is_an_error():
+    assert cache.from_config({'PAGE_CACHE': None}) is None
+    with pytest.raises(ValueError):
+        cache.from_config({'PAGE_CACHE': 'redis'})
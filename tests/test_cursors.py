@@ -0,0 +1,45 @@
+import base64
+import json
+
+import pytest
+
+
+def cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+BAD_CURSORS = [
+    ('/artists', 'not base64!'),
+    ('/artists', base64.urlsafe_b64encode(b'not json').decode()),
+    ('/artists', base64.urlsafe_b64encode(b'\xff\xfe').decode()),
+    ('/artists', cursor(['x'])),
+    ('/artists', cursor({'a': 1})),
+    ('/artists', cursor([1.5])),
+    ('/artists', cursor([True])),
+    ('/artists', cursor([None])),
+    ('/artists', cursor([2**31])),
+    ('/artists', cursor([1, 2])),
+    ('/artists', cursor('1')),
+    ('/shows', cursor(['2020-01-01', 'y'])),
+    ('/shows', cursor(['yesterday', 1])),
+    ('/shows', cursor([20200101, 1])),
+    ('/venues', cursor([1, 'CA', 1])),
+    ('/venues', cursor(['Austin', None, 1])),
+    ('/venues', cursor(['Aus\x00tin', 'TX', 1])),
+]
+
+
+@pytest.mark.parametrize('path,value', BAD_CURSORS)
+@pytest.mark.parametrize('direction', ['after', 'before'])
+def test_malformed_cursor_is_a_bad_request(client, path, value, direction):
+    assert client.get(path, query_string={direction: value}).status_code == 400
+
+
+@pytest.mark.parametrize('path,value', [
+    ('/artists', cursor([1])),
+    ('/shows', cursor(['2020-01-01', 1])),
+    ('/venues', cursor(['Austin', 'TX', 1])),
+    ('/venues', cursor(['', '', 1])),
+])
+def test_well_formed_cursor_pages(client, path, value):
+    assert client.get(path, query_string={'after': value}).status_code == 200
@@ -0,0 +1,66 @@
+import csv
+
+import pytest
+
+from conftest import TEST_PREFIX
+from importer import Importer
+
+
+@pytest.fixture
+def importer(fyyur, context, tmp_path):
+    importer = Importer(fyyur.db, {'venues': fyyur.Venue, 'artists': fyyur.Artist, 'shows': fyyur.Show},
+                        fyyur.ImportCheckpoint, batch_size=2, log=lambda message: None)
+    yield importer
+    fyyur.ImportCheckpoint.query.filter(fyyur.ImportCheckpoint.source.contains(str(tmp_path))).delete(
+        synchronize_session=False)
+    fyyur.db.session.commit()
+
+
+def write_venues(path, names):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['name', 'city', 'state'])
+        for name in names:
+            writer.writerow([TEST_PREFIX + name if name else '', 'Austin', 'TX'])
+
+
+def imported(fyyur):
+    return sorted(name for name, in fyyur.db.session.query(fyyur.Venue.name).filter(
+        fyyur.Venue.name.like(TEST_PREFIX + '%')))
+
+
+def rejected(path):
+    with open(path, newline='') as f:
+        return [row[0] for row in csv.reader(f)][1:]
+
+
+def test_new_file_at_the_same_path_is_imported_from_the_start(fyyur, importer, tmp_path):
+    path = str(tmp_path / 'venues.csv')
+    write_venues(path, ['monday-1', 'monday-2'])
+    assert importer.run('venues', path) == {'inserted': 2, 'rejected': 0, 'skipped': 0}
+    write_venues(path, ['tuesday-1', 'tuesday-2', 'tuesday-3'])
+    assert importer.run('venues', path) == {'inserted': 3, 'rejected': 0, 'skipped': 0}
+    assert imported(fyyur) == [TEST_PREFIX + name for name in
+                               ['monday-1', 'monday-2', 'tuesday-1', 'tuesday-2', 'tuesday-3']]
+    assert fyyur.ImportCheckpoint.query.filter(
+        fyyur.ImportCheckpoint.source.contains(str(tmp_path))).count() == 1
+
+
+def test_same_file_resumes_after_its_checkpoint(fyyur, importer, tmp_path):
+    path = str(tmp_path / 'venues.csv')
+    write_venues(path, ['one', 'two', 'three'])
+    importer.run('venues', path)
+    assert importer.run('venues', path) == {'inserted': 0, 'rejected': 0, 'skipped': 3}
+    assert len(imported(fyyur)) == 3
+
+
+def test_rejects_start_afresh_with_the_first_record(importer, tmp_path):
+    path = str(tmp_path / 'venues.csv')
+    write_venues(path, ['one', '', 'three', ''])
+    assert importer.run('venues', path)['rejected'] == 2
+    assert rejected(path + '.rejects.csv') == ['2', '4']
+    assert importer.run('venues', path, restart=True)['rejected'] == 2
+    assert rejected(path + '.rejects.csv') == ['2', '4']
+    write_venues(path, ['', 'two'])
+    assert importer.run('venues', path)['rejected'] == 1
+    assert rejected(path + '.rejects.csv') == ['1']
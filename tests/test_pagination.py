@@ -0,0 +1,72 @@
+import html
+import re
+from datetime import date
+
+import pytest
+
+from conftest import TEST_PREFIX
+
+GENRE = TEST_PREFIX + 'genre'
+NEXT_LINK = re.compile(r'<a href="([^"]*)">Next')
+AREA_HEADING = re.compile(r'<h3>(.*), (.*)</h3>')
+
+
+def venue_page(fyyur, per_page, after=None, before=None):
+    query = fyyur.genre_filter(fyyur.venue_directory_query(date.today()), fyyur.Venue, [GENRE])
+    return fyyur.paginate(query, fyyur.VENUE_DIRECTORY_ORDER, after=after, before=before, per_page=per_page)
+
+
+@pytest.fixture
+def venue_ids(fyyur, context):
+    places = [('Austin', 'TX'), (None, 'TX'), ('Austin', None), (None, None), ('', ''),
+              ('Boston', 'MA'), (None, 'MA'), ('Chicago', None)]
+    venues = [fyyur.Venue(name='%svenue-%d' % (TEST_PREFIX, i), city=city, state=state, genres=[GENRE])
+              for i, (city, state) in enumerate(places * 2)]
+    fyyur.db.session.add_all(venues)
+    fyyur.db.session.commit()
+    return [venue.id for venue in venues]
+
+
+@pytest.mark.parametrize('per_page', [1, 3, 7, 50])
+def test_venue_pages_reach_null_cities_and_states(fyyur, venue_ids, per_page):
+    pages = []
+    rows, next_cursor, prev_cursor = venue_page(fyyur, per_page)
+    pages.append([row.id for row in rows])
+    while next_cursor:
+        rows, next_cursor, prev_cursor = venue_page(fyyur, per_page, after=next_cursor)
+        pages.append([row.id for row in rows])
+    assert sorted(id for page in pages for id in page) == sorted(venue_ids)
+    assert all(len(page) == per_page for page in pages[:-1])
+
+    # and back again from the last page
+    backward = [pages[-1]]
+    while prev_cursor:
+        rows, next_cursor, prev_cursor = venue_page(fyyur, per_page, before=prev_cursor)
+        backward.append([row.id for row in rows])
+    assert backward[::-1] == pages
+
+
+def test_venue_listing_links_every_page(fyyur, client, venue_ids):
+    fyyur.app.config['PAGE_SIZE'] = 5
+    try:
+        seen = []
+        url = '/venues?genre=' + GENRE
+        while url:
+            response = client.get(url)
+            assert response.status_code == 200
+            body = response.get_data(as_text=True)
+            seen.extend(id for id in venue_ids if 'href="/venues/%d"' % id in body)
+            link = NEXT_LINK.search(body)
+            url = html.unescape(link.group(1)) if link else None
+        assert sorted(seen) == sorted(venue_ids)
+    finally:
+        fyyur.app.config['PAGE_SIZE'] = 50
+
+
+def test_venue_listing_heads_each_area_once(client, venue_ids):
+    # NULL and '' cities and states are one area, listed once
+    body = client.get('/venues?genre=' + GENRE).get_data(as_text=True)
+    areas = AREA_HEADING.findall(body)
+    assert sorted(areas) == sorted(set(areas))
+    assert sorted(areas) == sorted([('Austin', 'TX'), ('', 'TX'), ('Austin', ''), ('', ''), ('Boston', 'MA'),
+                                    ('', 'MA'), ('Chicago', '')])
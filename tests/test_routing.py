@@ -0,0 +1,81 @@
+import time
+
+import pytest
+from sqlalchemy import event
+
+import cache
+from conftest import TEST_PREFIX, delete_test_rows
+
+# Each request here runs in an app context of its own, as it would when
+# served: one left pushed by a fixture would carry g.db_replica from one
+# request to the next.
+
+
+@pytest.fixture
+def venue(fyyur):
+    # on the primary only: the replica has not caught up
+    with fyyur.app.app_context():
+        venue = fyyur.Venue(name=TEST_PREFIX + 'venue', city='Austin', state='TX', genres=[TEST_PREFIX + 'genre'])
+        fyyur.db.session.add(venue)
+        fyyur.db.session.commit()
+        id = venue.id
+    yield id
+    with fyyur.app.app_context():
+        delete_test_rows(fyyur)
+
+
+@pytest.fixture
+def page_cache(fyyur, monkeypatch):
+    page_cache = cache.PageCache(cache.LRUBackend())
+    monkeypatch.setattr(fyyur, 'page_cache', page_cache)
+    return page_cache
+
+
+def test_reads_go_to_the_replica_and_flushes_to_the_primary(fyyur, replica, venue):
+    flushed_to = []
+
+    def note_bind(db_session, flush_context, instances):
+        flushed_to.append(db_session.get_bind())
+
+    event.listen(fyyur.RoutingSession, 'before_flush', note_bind)
+    try:
+        with fyyur.app.app_context(), fyyur.app.test_request_context('/venues'):
+            assert fyyur.db.session().get_bind() is fyyur.db.engine
+            assert fyyur.db.use_replica() == 'replica0'
+            assert fyyur.db.session().get_bind() is replica
+            assert fyyur.Venue.query.get(venue) is None
+            fyyur.db.session.add(fyyur.Venue(name=TEST_PREFIX + 'written', genres=[]))
+            fyyur.db.session.commit()
+            assert 'primary_until' in fyyur.session
+    finally:
+        event.remove(fyyur.RoutingSession, 'before_flush', note_bind)
+    assert flushed_to == [fyyur.db.engine]
+    with fyyur.app.app_context():
+        assert fyyur.Venue.query.filter_by(name=TEST_PREFIX + 'written').count() == 1
+
+
+def test_browser_reads_its_own_write_from_the_primary(fyyur, client, replica, venue, page_cache):
+    # a replica_reads view, from the replica
+    assert client.get('/venues/%d' % venue).status_code == 404
+    lookups = (page_cache.hits, page_cache.misses)
+
+    response = client.post('/venues/%d/edit' % venue, data={
+        'name': TEST_PREFIX + 'renamed', 'city': 'Austin', 'state': 'TX', 'address': '1 Main St',
+        'phone': '512-555-0100', 'genres': [TEST_PREFIX + 'genre'], 'facebook_link': ''})
+    assert response.status_code == 302
+    with client.session_transaction() as session:
+        assert session['primary_until'] > time.time()
+
+    # the redirect and the pages after it read the primary, past the page cache
+    for _ in range(2):
+        response = client.get(response.headers['Location'] if response.status_code == 302
+                              else '/venues/%d' % venue)
+        assert response.status_code == 200
+        assert TEST_PREFIX + 'renamed' in response.get_data(as_text=True)
+    assert (page_cache.hits, page_cache.misses) == lookups
+    assert len(page_cache.backend) == 0
+
+    # and the replica again once the write is old enough
+    with client.session_transaction() as session:
+        session['primary_until'] = 0
+    assert client.get('/venues/%d' % venue).status_code == 404
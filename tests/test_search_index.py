@@ -0,0 +1,82 @@
+import random
+
+import pytest
+
+from conftest import TEST_PREFIX
+from search_index import PrefixIndex, tokenize
+
+WORDS = ['velvet', 'owls', 'owl', 'velvets', 'thunder', 'hop', 'musical', 'the', 'vel']
+QUERIES = ['v', 'vel', 'velvet ow', 'ow velvet', 'thunder 12', 'thunder 1', 'the mus hop', 'owls owl',
+           'velvets vel', 'zzz', 'thunder zzz']
+
+
+def names(count):
+    rng = random.Random(0)
+    return {i: ' '.join(rng.sample(WORDS, rng.randint(1, 3)) + [str(i)]) for i in range(count)}
+
+
+def matches(name, query):
+    words = tokenize(name)
+    return all(any(word.startswith(token) for word in words) for token in tokenize(query))
+
+
+@pytest.fixture
+def index():
+    index = PrefixIndex()
+    for id, name in names(300).items():
+        index.add('artist', id, name)
+    return index
+
+
+@pytest.mark.parametrize('query', QUERIES)
+def test_search_finds_every_entry_with_each_prefix(index, query):
+    expected = sorted(id for id, name in names(300).items() if matches(name, query))
+    found = index.search('artist', query, limit=1000)
+    assert sorted(id for id, name in found) == expected
+    assert all(name == names(300)[id] for id, name in found)
+
+
+@pytest.mark.parametrize('query', QUERIES)
+@pytest.mark.parametrize('limit', [1, 3, 10])
+def test_search_stops_at_limit_with_the_first_entries(index, query, limit):
+    assert index.search('artist', query, limit) == index.search('artist', query, limit=1000)[:limit]
+
+
+def test_search_follows_renames_and_removals(index):
+    index.add('artist', 12, 'quiet owls')
+    index.remove('artist', 13)
+    assert index.search('artist', 'quiet ow') == [(12, 'quiet owls')]
+    assert 12 not in [id for id, name in index.search('artist', '12', limit=1000)]
+    assert 13 not in [id for id, name in index.search('artist', '13', limit=1000)]
+    assert len(index) == 299
+    assert index.search('venue', 'owls') == []
+    assert index.search('artist', ' ') == []
+
+
+def test_edit_during_build_outlives_the_row_read_before_it(fyyur, context, monkeypatch):
+    if fyyur.autocomplete_index is None:
+        pytest.skip('AUTOCOMPLETE_INDEX is off')
+    venue = fyyur.Venue(name=TEST_PREFIX + 'venue before', genres=[TEST_PREFIX + 'genre'])
+    fyyur.db.session.add(venue)
+    fyyur.db.session.commit()
+    renamed = []
+
+    class RenamingIndex(PrefixIndex):
+        # renames the venue once the build has read its old name
+        def add(self, kind, id, name):
+            super(RenamingIndex, self).add(kind, id, name)
+            if (kind, id) == ('venue', venue.id) and not renamed:
+                renamed.append(id)
+                fyyur.update_autocomplete_index('venue', id, TEST_PREFIX + 'venue after')
+
+    monkeypatch.setattr(fyyur, 'PrefixIndex', RenamingIndex)
+    monkeypatch.setattr(fyyur, 'autocomplete_index', PrefixIndex())
+    fyyur.autocomplete_built.clear()
+    try:
+        fyyur.build_autocomplete_index()
+        assert renamed == [venue.id]
+        assert fyyur.autocomplete_index.search('venue', TEST_PREFIX + 'venue after') == \
+            [(venue.id, TEST_PREFIX + 'venue after')]
+        assert fyyur.autocomplete_index.search('venue', TEST_PREFIX + 'venue before') == []
+    finally:
+        fyyur.autocomplete_built.clear()
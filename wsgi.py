@@ -0,0 +1,63 @@
+import os
+from datetime import datetime
+
+# the production profile unless told otherwise: the development one keeps
+# a page cache and an autocomplete index in each process (see config.py)
+os.environ.setdefault('FYYUR_ENV', 'production')
+
+from app import app, db, build_autocomplete_index, format_datetime
+
+# Production entry point:
+#
+#     SECRET_KEY=... DATABASE_URL=... gunicorn wsgi:app
+#
+# gunicorn.conf.py picks the worker model from WORKER_MODEL: 'prefork' (one
+# request at a time per process, WEB_CONCURRENCY processes) or 'threaded'
+# (WORKER_THREADS threads in each of WEB_CONCURRENCY processes). The app is
+# loaded once in the master and warmed up there, so every forked worker
+# starts with compiled templates, loaded locale data and (if enabled) the
+# autocomplete index already in memory. Database connections must not cross
+# a fork: the master checks the database and then closes its pools, and each
+# worker opens a connection per thread right after the fork.
+
+
+def engines():
+    return [db.engine] + [db.get_engine(app, bind) for bind in db.replicas(app)]
+
+
+def per_process_caches():
+    # settings that keep a copy in each process, which writes handled by
+    # another process leave stale
+    caches = []
+    if app.config['PAGE_CACHE'] == 'lru':
+        caches.append('PAGE_CACHE=lru')
+    if app.config['AUTOCOMPLETE_INDEX']:
+        caches.append('AUTOCOMPLETE_INDEX')
+    return caches
+
+
+def warm_up():
+    for name in app.jinja_env.list_templates(extensions=['html']):
+        app.jinja_env.get_template(name)
+    for format in ('full', 'medium'):
+        format_datetime(datetime.now(), format)
+    for engine in engines():
+        engine.connect().close()
+    with app.app_context():
+        build_autocomplete_index()
+    for engine in engines():
+        engine.dispose()
+
+
+def after_fork(threads=1):
+    # open a connection per thread (up to pool_size) for each engine, so
+    # the first requests of this worker do not pay for connecting; a sync
+    # worker serving one request at a time needs only one
+    for engine in engines():
+        connections = [engine.connect() for _ in range(min(engine.pool.size(), threads))]
+        for connection in connections:
+            connection.close()
+
+
+warm_up()
+application = app